@@ -5,10 +5,9 @@ Streamlit 主应用入口
 import streamlit as st
 from datetime import datetime
 
-from data.fetcher import DataFetcher
 from signals.analyzer import StrategyAnalyzer, ActionType
-from database.models import Database
 from config import INDEX_CODES
+from utils.singletons import get_db, get_fetcher, get_analyzer
 
 # 页面配置
 st.set_page_config(
@@ -18,10 +17,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 初始化
-db = Database()
-analyzer = StrategyAnalyzer()
-fetcher = DataFetcher()
+# 初始化（跨重跑、跨页面共享）
+db = get_db()
+analyzer = get_analyzer()
+fetcher = get_fetcher()
 
 
 def render_signal_card(code: str, name: str, action: str, reason: str):
@@ -85,7 +84,7 @@ def main():
                 code = stock["code"]
                 name = stock["name"]
 
-                df = fetcher.get_stock_data(code, days=60)
+                df = fetcher.get_stock_data(code, days=StrategyAnalyzer.LOOKBACK_DAYS)
                 if df is None:
                     continue
 
@@ -98,9 +98,14 @@ def calculate_rsi(close: pd.Series, period: int = 14) -> pd.Series:
     Returns:
         RSI序列
     """
-    delta = close.diff()
-    gain = delta.where(delta > 0, 0)
-    loss = (-delta).where(delta < 0, 0)
+    # 直接在ndarray上取涨跌幅，避免 Series.where 的对齐检查和取负产生的整列副本；
+    # 首位及含NaN处比较结果为False，涨跌都记0（同原先 where 的行为）
+    values = close.to_numpy(dtype=np.float64)
+    delta = np.empty_like(values)
+    delta[:1] = np.nan
+    delta[1:] = values[1:] - values[:-1]
+    gain = pd.Series(np.where(delta > 0, delta, 0.0), index=close.index)
+    loss = pd.Series(np.where(delta < 0, -delta, 0.0), index=close.index)
 
     avg_gain = gain.rolling(window=period).mean()
     avg_loss = loss.rolling(window=period).mean()
@@ -1,6 +1,7 @@
 """
 K线形态识别模块 - 反转三兄弟核心形态
 """
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
 from typing import Optional
@@ -448,9 +449,11 @@ class PatternRecognizer:
         if len(df) < period:
             return "sideways"
 
-        closes = df["close"].tail(period)
-        first_half = closes.head(period // 2).mean()
-        second_half = closes.tail(period // 2).mean()
+        # 直接切ndarray视图，不再经 tail/head 构造三个中间 Series
+        closes = df["close"].to_numpy(dtype=np.float64)[-period:]
+        half = period // 2
+        first_half = closes[:half].mean()
+        second_half = closes[-half:].mean()
 
         change_pct = (second_half - first_half) / first_half
 
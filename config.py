@@ -16,6 +16,9 @@ SERVERCHAN_KEY = os.getenv("SERVERCHAN_KEY", "")
 # 默认推送时间
 DEFAULT_PUSH_TIME = "15:30"
 
+# A股收盘时间（此后保存的当日分析结果不再变化）
+MARKET_CLOSE_TIME = "15:00:00"
+
 # 数据获取配置
 DATA_CONFIG = {
     "default_period": 60,  # 默认获取60天数据
@@ -1,13 +1,208 @@
 """
 数据获取模块 - 使用腾讯财经API
 """
+import asyncio
+import functools
+import numpy as np
 import pandas as pd
 import requests
+import httpx
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict
-import streamlit as st
-import json
+from typing import Optional, List, Dict, Any, Callable
 import time
+import threading
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class _NullCache:
+    """
+    脱离Streamlit运行时（如命令行扫描脚本）的替身
+
+    cache_data 不做缓存；cache_resource 退化为进程内单例；提示信息输出到控制台
+    """
+
+    @staticmethod
+    def cache_data(func=None, **kwargs):
+        if func is None:
+            return lambda f: f
+        return func
+
+    @staticmethod
+    def cache_resource(func=None, **kwargs):
+        if func is None:
+            return functools.lru_cache(maxsize=None)
+        return functools.lru_cache(maxsize=None)(func)
+
+    @staticmethod
+    def error(body):
+        print(body)
+
+    @staticmethod
+    def warning(body):
+        print(body)
+
+
+try:
+    import streamlit as st
+except ImportError:
+    st = _NullCache()
+
+
+# 默认请求头（腾讯接口）
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Referer": "https://gu.qq.com/"
+}
+
+# 东方财富接口需要不同的Referer
+EASTMONEY_HEADERS = {
+    "Referer": "https://quote.eastmoney.com/"
+}
+
+# 代码首位 -> 交易所
+_PREFIX_TO_EXCHANGE = {
+    "6": "sh",  # 上海主板 + 科创板(688)
+    "5": "sh",  # 上海ETF (51xxxx, 56xxxx等)
+    "0": "sz",  # 深圳主板
+    "3": "sz",  # 创业板
+    "1": "sz",  # 深圳ETF (159xxx)
+    "8": "bj",  # 北交所
+    "4": "bj",  # 北交所
+}
+
+# 常用指数 -> 腾讯代码
+_INDEX_TENCENT_SYMBOLS = {
+    "000001": "sh000001",  # 上证指数
+    "399001": "sz399001",  # 深证成指
+    "399006": "sz399006",  # 创业板指
+    "000688": "sh000688",  # 科创50
+}
+
+# 东方财富搜索中的A股证券类型: 1上海主板, 2深圳主板, 25科创板, 23创业板
+_A_SEC_TYPES = frozenset({"1", "2", "25", "23"})
+
+# ETF代码前缀
+_ETF_PREFIXES = ("5", "159")
+
+# 腾讯行情字段位置: (字段名, 下标)
+_QUOTE_TEXT_FIELDS = (
+    ("code", 2),
+    ("name", 1),
+)
+
+# 腾讯行情数值字段: (字段名, 下标, 倍数)
+_QUOTE_NUM_FIELDS = (
+    ("price", 3, 1),
+    ("prev_close", 4, 1),
+    ("open", 5, 1),
+    ("volume", 6, 100),  # 手转股
+    ("amount", 37, 10000),  # 万元转元
+    ("high", 33, 1),
+    ("low", 34, 1),
+    ("change", 31, 1),
+    ("pct_change", 32, 1),
+    ("volume_ratio", 49, 1),  # 量比
+)
+
+# 批量行情每次请求的代码数
+BATCH_QUOTE_SIZE = 60
+
+
+class _InflightCall:
+    """正在进行中的请求"""
+    __slots__ = ("event", "result")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+_inflight: Dict[tuple, _InflightCall] = {}
+_inflight_lock = threading.Lock()
+
+
+def _single_flight(key: tuple, fn: Callable[[], Any]) -> Any:
+    """
+    合并并发的相同请求：同一key只有第一个调用者真正执行fn，
+    其余调用者等待并共享其结果
+    """
+    with _inflight_lock:
+        call = _inflight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _inflight[key] = _InflightCall()
+
+    if not is_leader:
+        call.event.wait()
+        return call.result
+
+    try:
+        call.result = fn()
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.event.set()
+
+    return call.result
+
+
+class _RateLimiter:
+    """
+    限流器：限制同时进行的请求数，并保证相邻请求的最小间隔（线程安全）
+
+    用法: with limiter: 发请求
+    """
+
+    __slots__ = ("_slots", "_lock", "_min_interval", "_next_at")
+
+    def __init__(self, max_concurrent: int, min_interval: float):
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._min_interval = min_interval
+        self._next_at = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        # 预约下一个发送时刻，锁内只做计算，等待在锁外
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self._min_interval
+        if wait > 0:
+            time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+# K线接口限流：最多8个并发，每秒不超过50次
+_kline_limiter = _RateLimiter(max_concurrent=8, min_interval=0.02)
+
+
+@st.cache_resource
+def _session() -> requests.Session:
+    """全局共享的HTTP会话，复用连接池"""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=64,
+            # 限流和服务端错误自动退避重试
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET"})
+            )
+        )
+    )
+    return session
 
 
 class DataFetcher:
@@ -24,38 +219,18 @@ class DataFetcher:
     @staticmethod
     def _get_tencent_symbol(symbol: str) -> str:
         """转换为腾讯格式的股票代码（支持股票和ETF）"""
-        if symbol.startswith("6"):
-            return f"sh{symbol}"  # 上海主板 + 科创板(688)
-        elif symbol.startswith("5"):
-            return f"sh{symbol}"  # 上海ETF (51xxxx, 56xxxx等)
-        elif symbol.startswith("0") or symbol.startswith("3"):
-            return f"sz{symbol}"  # 深圳主板 + 创业板
-        elif symbol.startswith("1"):
-            return f"sz{symbol}"  # 深圳ETF (159xxx)
-        elif symbol.startswith("8") or symbol.startswith("4"):
-            return f"bj{symbol}"  # 北交所
-        else:
-            return f"sh{symbol}"
+        return f"{_PREFIX_TO_EXCHANGE.get(symbol[:1], 'sh')}{symbol}"
 
     @staticmethod
     def _get_index_tencent_symbol(symbol: str) -> str:
         """转换指数代码为腾讯格式"""
-        if symbol == "000001":
-            return "sh000001"  # 上证指数
-        elif symbol == "399001":
-            return "sz399001"  # 深证成指
-        elif symbol == "399006":
-            return "sz399006"  # 创业板指
-        elif symbol == "000688":
-            return "sh000688"  # 科创50
-        else:
-            if symbol.startswith("000"):
-                return f"sh{symbol}"
-            else:
-                return f"sz{symbol}"
+        tencent_symbol = _INDEX_TENCENT_SYMBOLS.get(symbol)
+        if tencent_symbol:
+            return tencent_symbol
+        return f"sh{symbol}" if symbol.startswith("000") else f"sz{symbol}"
 
     @staticmethod
-    @st.cache_data(ttl=300)  # 缓存5分钟
+    @st.cache_data(ttl=300, max_entries=500)  # 缓存5分钟
     def get_stock_data(
         symbol: str,
         days: int = 60,
@@ -72,65 +247,90 @@ class DataFetcher:
         Returns:
             DataFrame with columns: date, open, high, low, close, volume
         """
+        # 同一只股票的并发请求只发一次
+        return _single_flight(
+            ("kline", symbol, days, adjust),
+            lambda: DataFetcher._fetch_stock_data(symbol, days, adjust)
+        )
+
+    @staticmethod
+    def _fetch_stock_data(symbol: str, days: int, adjust: str) -> Optional[pd.DataFrame]:
+        """请求腾讯K线接口（无缓存）"""
         try:
             tencent_symbol = DataFetcher._get_tencent_symbol(symbol)
             fq_type = "qfq" if adjust == "qfq" else ("hfq" if adjust == "hfq" else "day")
 
-            params = {
-                "param": f"{tencent_symbol},day,,,{days},{fq_type}"
-            }
+            # 参数只含URL安全字符，直接拼接，省去params编码
+            with _kline_limiter:
+                response = _session().get(
+                    f"{DataFetcher.TENCENT_KLINE_API}?param={tencent_symbol},day,,,{days},{fq_type}",
+                    timeout=10
+                )
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://gu.qq.com/"
-            }
+            return DataFetcher._parse_kline_response(orjson.loads(response.content), tencent_symbol, fq_type)
 
-            response = requests.get(
-                DataFetcher.TENCENT_KLINE_API,
-                params=params,
-                headers=headers,
-                timeout=10
-            )
+        except Exception as e:
+            st.error(f"获取股票 {symbol} 数据失败: {e}")
+            return None
 
-            data = response.json()
+    @staticmethod
+    def _loads_jsonp(raw: bytes) -> Dict:
+        """解析 jQuery(...) 形式的JSONP响应，直接在字节上切片避免整体解码"""
+        start = raw.index(b"(")
+        end = raw.rindex(b")")
+        return orjson.loads(memoryview(raw)[start + 1:end])
 
-            if not data.get("data"):
-                return None
+    @staticmethod
+    def _parse_kline_response(data: Dict, tencent_symbol: str, fq_type: str) -> Optional[pd.DataFrame]:
+        """解析腾讯K线接口返回的JSON为DataFrame"""
+        if not data.get("data"):
+            return None
 
-            stock_data = data["data"].get(tencent_symbol)
-            if not stock_data:
-                return None
+        stock_data = data["data"].get(tencent_symbol)
+        if not stock_data:
+            return None
 
-            # 获取复权数据
-            klines = stock_data.get(f"{fq_type}day") or stock_data.get("day")
-            if not klines:
-                return None
+        # 获取复权数据
+        klines = stock_data.get(f"{fq_type}day") or stock_data.get("day")
+        if not klines:
+            return None
 
-            # 解析数据: [日期, 开盘, 收盘, 最高, 最低, 成交量]
-            records = []
-            for kline in klines:
-                records.append({
-                    "date": kline[0],
-                    "open": float(kline[1]),
-                    "close": float(kline[2]),
-                    "high": float(kline[3]),
-                    "low": float(kline[4]),
-                    "volume": float(kline[5]) if len(kline) > 5 else 0,
-                    "amount": 0  # 腾讯API不提供成交额
-                })
-
-            df = pd.DataFrame(records)
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.sort_values("date").reset_index(drop=True)
+        return DataFetcher._klines_to_df(klines)
 
-            return df
+    @staticmethod
+    def _klines_to_df(klines: List[list], with_amount: bool = True) -> pd.DataFrame:
+        """
+        按列构建K线DataFrame
 
-        except Exception as e:
-            st.error(f"获取股票 {symbol} 数据失败: {e}")
-            return None
+        Args:
+            klines: [[日期, 开盘, 收盘, 最高, 最低, 成交量], ...]
+            with_amount: 是否附加成交额列（腾讯API不提供，填0）
+        """
+        # 单次遍历拆出日期和数值，方法绑定为局部变量省去每行的属性查找
+        dates = []
+        rows = []
+        add_date = dates.append
+        add_row = rows.append
+        for date, o, c, h, l, *rest in klines:
+            add_date(date)
+            add_row((o, c, h, l, rest[0] if rest else 0))
+
+        # 字符串到float的转换交给numpy一次完成，得到连续的float64二维块，下游 to_numpy() 无需拷贝
+        values = np.array(rows, dtype=np.float64)
+        df = pd.DataFrame(values, columns=["open", "close", "high", "low", "volume"])
+        df.insert(0, "date", pd.to_datetime(dates, format="%Y-%m-%d", cache=True))
+
+        if with_amount:
+            df["amount"] = 0  # 腾讯API不提供成交额
+
+        # assume ascending: 接口按日期升序返回，仅在顺序异常时才排序
+        if not df["date"].is_monotonic_increasing:
+            df = df.sort_values("date").reset_index(drop=True)
+
+        return df
 
     @staticmethod
-    @st.cache_data(ttl=300)
+    @st.cache_data(ttl=300, max_entries=500)
     def get_index_data(
         symbol: str,
         days: int = 60
@@ -148,23 +348,12 @@ class DataFetcher:
         try:
             tencent_symbol = DataFetcher._get_index_tencent_symbol(symbol)
 
-            params = {
-                "param": f"{tencent_symbol},day,,,{days},"
-            }
-
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://gu.qq.com/"
-            }
-
-            response = requests.get(
-                DataFetcher.TENCENT_KLINE_API,
-                params=params,
-                headers=headers,
+            response = _session().get(
+                f"{DataFetcher.TENCENT_KLINE_API}?param={tencent_symbol},day,,,{days},",
                 timeout=10
             )
 
-            data = response.json()
+            data = orjson.loads(response.content)
 
             if not data.get("data"):
                 return None
@@ -177,29 +366,13 @@ class DataFetcher:
             if not klines:
                 return None
 
-            records = []
-            for kline in klines:
-                records.append({
-                    "date": kline[0],
-                    "open": float(kline[1]),
-                    "close": float(kline[2]),
-                    "high": float(kline[3]),
-                    "low": float(kline[4]),
-                    "volume": float(kline[5]) if len(kline) > 5 else 0
-                })
-
-            df = pd.DataFrame(records)
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.sort_values("date").reset_index(drop=True)
-
-            return df
+            return DataFetcher._klines_to_df(klines, with_amount=False)
 
         except Exception as e:
             st.error(f"获取指数 {symbol} 数据失败: {e}")
             return None
 
     @staticmethod
-    @st.cache_data(ttl=3600)  # 缓存1小时
     def get_all_stocks() -> pd.DataFrame:
         """
         获取A股股票列表 - 使用东方财富板块成分股API
@@ -208,67 +381,95 @@ class DataFetcher:
             DataFrame with columns: code, name
         """
         try:
-            all_stocks = []
-            seen_codes = set()
+            return DataFetcher._fetch_all_stocks()
+        except Exception as e:
+            st.error(f"获取股票列表失败: {e}")
+            return pd.DataFrame(columns=["code", "name"])
+
+    @staticmethod
+    @st.cache_data(persist="disk", max_entries=50)  # 持久化到磁盘，重启后无需重新拉取
+    def _fetch_all_stocks() -> pd.DataFrame:
+        """
+        拉取A股股票列表（磁盘缓存）
 
-            # 获取多个板块的成分股
-            boards = ["b:BK0500", "b:BK0701", "b:BK0804", "b:BK0600"]
+        磁盘缓存不支持ttl，由「清除缓存」手动刷新；获取失败时抛出异常，
+        避免把空结果持久化。
+        """
+        # 获取多个板块的成分股（并发请求，一次往返）
+        boards = ["b:BK0500", "b:BK0701", "b:BK0804", "b:BK0600"]
+        board_items = asyncio.run(DataFetcher._gather_boards(boards))
+
+        # 代码 -> 名称，按板块顺序去重
+        all_stocks: Dict[str, str] = {}
+        for items in board_items:
+            for item in items:
+                code = item.get("f12", "")
+                name = item.get("f14", "")
+                if code and name:
+                    all_stocks.setdefault(code, name)
+
+        if not all_stocks:
+            raise ValueError("板块成分股接口无数据")
+
+        df = pd.DataFrame({
+            "code": list(all_stocks.keys()),
+            "name": list(all_stocks.values())
+        })
+        return df
 
-            url = DataFetcher.EASTMONEY_LIST_API
+    @staticmethod
+    async def _fetch_board(
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        board: str
+    ) -> List[Dict]:
+        """异步获取单个板块的成分股列表，失败返回空列表"""
+        params = {
+            "cb": "jQuery",
+            "fid": "f3",
+            "po": 1,
+            "pz": 500,
+            "pn": 1,
+            "np": 1,
+            "fltt": 2,
+            "invt": 2,
+            "ut": "b2884a393a59ad64002292a3e90d46a5",
+            "fs": board,
+            "fields": "f12,f14",
+            "_": int(datetime.now().timestamp() * 1000)
+        }
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://quote.eastmoney.com/"
-            }
+        try:
+            async with semaphore:
+                response = await client.get(DataFetcher.EASTMONEY_LIST_API, params=params)
+            raw = response.content
 
-            for board in boards:
-                try:
-                    params = {
-                        "cb": "jQuery",
-                        "fid": "f3",
-                        "po": 1,
-                        "pz": 500,
-                        "pn": 1,
-                        "np": 1,
-                        "fltt": 2,
-                        "invt": 2,
-                        "ut": "b2884a393a59ad64002292a3e90d46a5",
-                        "fs": board,
-                        "fields": "f12,f14",
-                        "_": int(datetime.now().timestamp() * 1000)
-                    }
-
-                    response = requests.get(url, params=params, headers=headers, timeout=15)
-                    text = response.text
-
-                    if "jQuery" in text:
-                        text = text[text.index("(") + 1 : text.rindex(")")]
-                        data = json.loads(text)
-
-                        if data.get("rc") == 0 and data.get("data") and data["data"].get("diff"):
-                            for item in data["data"]["diff"]:
-                                code = item.get("f12", "")
-                                name = item.get("f14", "")
-                                if code and name and code not in seen_codes:
-                                    all_stocks.append({
-                                        "code": code,
-                                        "name": name
-                                    })
-                                    seen_codes.add(code)
-
-                    time.sleep(0.1)  # 避免请求太快
-                except:
-                    continue
+            if raw.startswith(b"jQuery"):
+                data = DataFetcher._loads_jsonp(raw)
+                if data.get("rc") == 0 and data.get("data") and data["data"].get("diff"):
+                    return data["data"]["diff"]
+        except (httpx.HTTPError, ValueError) as e:
+            st.warning(f"获取板块 {board} 成分股失败: {e}")
 
-            df = pd.DataFrame(all_stocks)
-            return df
+        return []
 
-        except Exception as e:
-            st.error(f"获取股票列表失败: {e}")
-            return pd.DataFrame(columns=["code", "name"])
+    @staticmethod
+    async def _gather_boards(boards: List[str]) -> List[List[Dict]]:
+        """并发获取多个板块的成分股，结果顺序与boards一致"""
+        # 同一主机限制并发数，避免请求过猛
+        semaphore = asyncio.Semaphore(4)
+        async with httpx.AsyncClient(
+            headers={**DEFAULT_HEADERS, **EASTMONEY_HEADERS},
+            timeout=15,
+            # 连接失败时重试
+            transport=httpx.AsyncHTTPTransport(http2=True, retries=3)
+        ) as client:
+            return await asyncio.gather(
+                *[DataFetcher._fetch_board(client, semaphore, b) for b in boards]
+            )
 
     @staticmethod
-    @st.cache_data(ttl=60)  # 缓存1分钟
+    @st.cache_data(ttl=60, max_entries=1000)  # 缓存1分钟
     def get_realtime_quote(symbol: str) -> Optional[Dict]:
         """
         获取个股实时行情 - 使用腾讯API
@@ -282,47 +483,81 @@ class DataFetcher:
         try:
             tencent_symbol = DataFetcher._get_tencent_symbol(symbol)
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://gu.qq.com/"
-            }
-
-            response = requests.get(
+            response = _session().get(
                 f"{DataFetcher.TENCENT_QUOTE_API}{tencent_symbol}",
-                headers=headers,
                 timeout=10
             )
 
-            text = response.text
+            raw = response.content
 
             # 解析腾讯行情数据
             # 格式: v_sh600519="1~贵州茅台~600519~1342.00~1337.00~1340.51~80166~..."
-            if "=" not in text or '""' in text:
+            start = raw.find(b'"')
+            end = raw.rfind(b'"')
+            if start < 0 or end <= start + 1:
                 return None
 
-            data_str = text.split("=")[1].strip().strip('"')
-            parts = data_str.split("~")
+            data_str = raw[start + 1:end].decode(response.encoding or "gbk")
+            return DataFetcher._parse_quote_fields(data_str)
 
-            if len(parts) < 35:
-                return None
+        except Exception as e:
+            return None
 
-            return {
-                "code": parts[2],
-                "name": parts[1],
-                "price": float(parts[3]) if parts[3] else 0,
-                "prev_close": float(parts[4]) if parts[4] else 0,
-                "open": float(parts[5]) if parts[5] else 0,
-                "volume": float(parts[6]) * 100 if parts[6] else 0,  # 手转股
-                "amount": float(parts[37]) * 10000 if len(parts) > 37 and parts[37] else 0,
-                "high": float(parts[33]) if len(parts) > 33 and parts[33] else 0,
-                "low": float(parts[34]) if len(parts) > 34 and parts[34] else 0,
-                "change": float(parts[31]) if len(parts) > 31 and parts[31] else 0,
-                "pct_change": float(parts[32]) if len(parts) > 32 and parts[32] else 0
-            }
+    @staticmethod
+    def _parse_quote_fields(data_str: str) -> Optional[Dict]:
+        """按字段表解析一条腾讯行情（~分隔），字段不足返回None"""
+        parts = data_str.split("~")
 
-        except Exception as e:
+        if len(parts) < 35:
             return None
 
+        n = len(parts)
+        quote = {key: parts[i] for key, i in _QUOTE_TEXT_FIELDS}
+        quote.update({
+            key: float(parts[i]) * m if i < n and parts[i] else 0
+            for key, i, m in _QUOTE_NUM_FIELDS
+        })
+        return quote
+
+    @staticmethod
+    @st.cache_data(ttl=60, max_entries=50)  # 缓存1分钟
+    def get_batch_quotes(codes: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取实时行情 - 腾讯行情接口一次请求可查多只股票
+
+        Args:
+            codes: 股票代码列表
+
+        Returns:
+            dict: 代码 -> 行情（字段同 get_realtime_quote，另含 volume_ratio 量比）
+        """
+        quotes: Dict[str, Dict] = {}
+        codes = list(dict.fromkeys(codes))
+
+        for i in range(0, len(codes), BATCH_QUOTE_SIZE):
+            chunk = codes[i:i + BATCH_QUOTE_SIZE]
+            try:
+                symbols = ",".join(DataFetcher._get_tencent_symbol(c) for c in chunk)
+                response = _session().get(f"{DataFetcher.TENCENT_QUOTE_API}{symbols}", timeout=10)
+                text = response.content.decode(response.encoding or "gbk")
+            except requests.RequestException:
+                continue
+
+            # 格式: v_sh600519="1~贵州茅台~600519~...";\nv_sz000001="...";
+            for line in text.split(";"):
+                start = line.find('"')
+                end = line.rfind('"')
+                if start < 0 or end <= start + 1:
+                    continue
+                try:
+                    quote = DataFetcher._parse_quote_fields(line[start + 1:end])
+                except ValueError:
+                    continue
+                if quote:
+                    quotes[quote["code"]] = quote
+
+        return quotes
+
     @staticmethod
     def search_stock(keyword: str, include_etf: bool = False) -> List[Dict]:
         """
@@ -343,18 +578,13 @@ class DataFetcher:
                 "count": 20
             }
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://quote.eastmoney.com/"
-            }
-
-            response = requests.get(
+            response = _session().get(
                 DataFetcher.EASTMONEY_SEARCH_API,
                 params=params,
-                headers=headers,
+                headers=EASTMONEY_HEADERS,
                 timeout=10
             )
-            data = response.json()
+            data = orjson.loads(response.content)
 
             results = []
             if data.get("QuotationCodeTable") and data["QuotationCodeTable"].get("Data"):
@@ -365,14 +595,14 @@ class DataFetcher:
                     sec_type = item.get("SecurityType", "")
 
                     # A股: 1上海主板, 2深圳主板, 25科创板, 23创业板
-                    if classify == "AStock" or sec_type in ("1", "2", "25", "23"):
+                    if classify == "AStock" or sec_type in _A_SEC_TYPES:
                         results.append({
                             "code": code,
                             "name": name,
                             "type": "stock"
                         })
                     # ETF: 代码以5或159开头
-                    elif include_etf and (code.startswith("5") or code.startswith("159")):
+                    elif include_etf and code.startswith(_ETF_PREFIXES):
                         results.append({
                             "code": code,
                             "name": name,
@@ -403,18 +633,13 @@ class DataFetcher:
                 "count": 30
             }
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://quote.eastmoney.com/"
-            }
-
-            response = requests.get(
+            response = _session().get(
                 DataFetcher.EASTMONEY_SEARCH_API,
                 params=params,
-                headers=headers,
+                headers=EASTMONEY_HEADERS,
                 timeout=10
             )
-            data = response.json()
+            data = orjson.loads(response.content)
 
             results = []
             if data.get("QuotationCodeTable") and data["QuotationCodeTable"].get("Data"):
@@ -422,7 +647,7 @@ class DataFetcher:
                     code = item.get("Code", "")
                     name = item.get("Name", "")
                     # ETF: 代码以5或159开头
-                    if code.startswith("5") or code.startswith("159"):
+                    if code.startswith(_ETF_PREFIXES):
                         results.append({
                             "code": code,
                             "name": name
@@ -434,7 +659,7 @@ class DataFetcher:
             return []
 
     @staticmethod
-    @st.cache_data(ttl=3600)
+    @st.cache_data(persist="disk", max_entries=50)
     def get_popular_etfs() -> List[Dict]:
         """获取热门ETF列表"""
         # 常见的宽基和行业ETF
@@ -458,7 +683,7 @@ class DataFetcher:
         return popular_etfs
 
     @staticmethod
-    @st.cache_data(ttl=300)
+    @st.cache_data(ttl=300, max_entries=500)
     def get_etf_data(symbol: str, days: int = 60) -> Optional[pd.DataFrame]:
         """
         获取ETF日K线数据（与股票数据获取相同）
@@ -466,9 +691,30 @@ class DataFetcher:
         return DataFetcher.get_stock_data(symbol, days)
 
     @staticmethod
-    @st.cache_data(ttl=3600)
+    @st.cache_resource(ttl=86400)
+    def _name_index() -> Dict[str, str]:
+        """
+        代码 -> 名称 索引（只读，所有会话共用同一个字典）
+
+        用 cache_resource 而不是 cache_data：后者每次读取都要反序列化出整个字典的副本。
+        基于磁盘缓存的股票列表构建，重启后只需重新组装字典；
+        股票列表获取失败时抛出异常，不缓存空索引。
+        """
+        df = DataFetcher._fetch_all_stocks()
+        return dict(zip(df["code"], df["name"]))
+
+    @staticmethod
+    @st.cache_data(ttl=3600, max_entries=5000)
     def get_stock_name(symbol: str) -> str:
-        """获取股票名称"""
+        """获取股票名称（按条数限制的缓存，超出后淘汰最旧的条目，相当于有界LRU）"""
+        # 优先从股票列表查名称，避免为取名称单独请求一次行情
+        try:
+            name = DataFetcher._name_index().get(symbol)
+            if name:
+                return name
+        except Exception:
+            pass
+
         try:
             quote = DataFetcher.get_realtime_quote(symbol)
             if quote and quote.get("name"):
@@ -478,7 +724,7 @@ class DataFetcher:
             return symbol
 
     @staticmethod
-    @st.cache_data(ttl=1800)
+    @st.cache_data(ttl=1800, max_entries=20)
     def get_stocks_for_scan(limit: int = 200) -> List[Dict]:
         """
         获取用于扫描的股票列表（按成交额排序的活跃股票）
@@ -507,36 +753,25 @@ class DataFetcher:
                 "_": int(datetime.now().timestamp() * 1000)
             }
 
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                "Referer": "https://quote.eastmoney.com/"
-            }
-
-            response = requests.get(url, params=params, headers=headers, timeout=15)
-            text = response.text
+            response = _session().get(url, params=params, headers=EASTMONEY_HEADERS, timeout=15)
+            raw = response.content
 
-            if "jQuery" in text:
-                text = text[text.index("(") + 1: text.rindex(")")]
-                data = json.loads(text)
+            if raw.startswith(b"jQuery"):
+                data = DataFetcher._loads_jsonp(raw)
 
                 if data.get("rc") == 0 and data.get("data") and data["data"].get("diff"):
-                    stocks = []
-                    for item in data["data"]["diff"]:
-                        code = item.get("f12", "")
-                        name = item.get("f14", "")
-                        change_pct = item.get("f3", 0)
-
-                        # 过滤ST股票和新股
-                        if "ST" in name or "N" == name[0:1] or "C" == name[0:1]:
-                            continue
-
-                        stocks.append({
-                            "code": code,
-                            "name": name,
-                            "change_pct": change_pct
-                        })
-
-                    return stocks
+                    diff = data["data"]["diff"]
+                    df = pd.DataFrame({
+                        "code": [item.get("f12", "") for item in diff],
+                        "name": [item.get("f14", "") for item in diff],
+                        "change_pct": [item.get("f3", 0) for item in diff]
+                    })
+
+                    # 过滤ST股票和新股（N/C开头）
+                    names = df["name"].astype("string")
+                    mask = ~(names.str.contains("ST", regex=False) | names.str[:1].isin(["N", "C"]))
+
+                    return df[mask].to_dict("records")
 
         except Exception as e:
             pass
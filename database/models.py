@@ -22,6 +22,8 @@ class Database:
         """获取数据库连接"""
         conn = sqlite3.connect(str(self.db_path))
         conn.row_factory = sqlite3.Row
+        # WAL模式下 NORMAL 只在检查点时fsync，提交不再每次落盘（该设置按连接生效）
+        conn.execute("PRAGMA synchronous=NORMAL")
         return conn
 
     def _init_db(self):
@@ -29,6 +31,9 @@ class Database:
         conn = self._get_connection()
         cursor = conn.cursor()
 
+        # WAL日志模式写入数据库文件，设置一次即持久生效；读写互不阻塞
+        cursor.execute("PRAGMA journal_mode=WAL")
+
         # 自选股表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS watchlist (
@@ -81,6 +86,35 @@ class Database:
             )
         """)
 
+        # Top10扫描结果缓存表（后台任务写入，页面直接读取）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS top10_cache (
+                scan_date TEXT NOT NULL,
+                code TEXT NOT NULL,
+                name TEXT NOT NULL,
+                score INTEGER,
+                bullish_score INTEGER,
+                bearish_score INTEGER,
+                change_pct REAL,
+                analysis TEXT,
+                created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (scan_date, code)
+            )
+        """)
+
+        # 个股分析结果缓存表（按交易日，跨会话/重启复用）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                code TEXT NOT NULL,
+                trade_date TEXT NOT NULL,
+                action TEXT,
+                score INTEGER,
+                analysis TEXT,
+                updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (code, trade_date)
+            )
+        """)
+
         conn.commit()
         conn.close()
 
@@ -146,6 +180,15 @@ class Database:
         conn.close()
         return result is not None
 
+    def get_watchlist_codes(self) -> set:
+        """获取自选股代码集合（一次查询，替代逐个 is_in_watchlist）"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT code FROM watchlist")
+        rows = cursor.fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
     def update_watchlist_order(self, code: str, new_order: int) -> bool:
         """更新自选股排序"""
         try:
@@ -239,6 +282,44 @@ class Database:
             print(f"获取买入信息失败: {e}")
             return {"buy_price": None, "buy_date": None, "buy_quantity": None}
 
+    def get_buy_infos(self, codes: List[str]) -> Dict[str, dict]:
+        """批量获取买入信息（一次查询），返回 代码 -> 买入信息，无记录的代码也有空值"""
+        empty = {"buy_price": None, "buy_date": None, "buy_quantity": None}
+        result = {code: dict(empty) for code in codes}
+        if not codes:
+            return result
+
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+
+            # 检查列是否存在
+            cursor.execute("PRAGMA table_info(watchlist)")
+            columns = [row[1] for row in cursor.fetchall()]
+
+            if "buy_price" not in columns:
+                conn.close()
+                return result
+
+            placeholders = ", ".join("?" * len(codes))
+            cursor.execute(
+                f"SELECT code, buy_price, buy_date, buy_quantity FROM watchlist WHERE code IN ({placeholders})",
+                list(codes)
+            )
+            rows = cursor.fetchall()
+            conn.close()
+
+            for row in rows:
+                result[row[0]] = {
+                    "buy_price": row[1],
+                    "buy_date": row[2],
+                    "buy_quantity": row[3]
+                }
+            return result
+        except Exception as e:
+            print(f"获取买入信息失败: {e}")
+            return result
+
     # ============ 信号历史 ============
 
     def save_signal(self, signal_dict: Dict) -> bool:
@@ -361,6 +442,20 @@ class Database:
 
         return row["value"] if row else default
 
+    def get_settings_dict(self, keys: List[str]) -> Dict[str, str]:
+        """一次查询获取多个配置项，未设置的键不在结果中"""
+        if not keys:
+            return {}
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(keys))
+        cursor.execute(f"SELECT key, value FROM settings WHERE key IN ({placeholders})", list(keys))
+        rows = cursor.fetchall()
+        conn.close()
+
+        return {row["key"]: row["value"] for row in rows}
+
     def set_setting(self, key: str, value: str) -> bool:
         """设置配置项"""
         try:
@@ -415,6 +510,41 @@ class Database:
             print(f"添加ETF失败: {e}")
             return False
 
+    def add_many_to_etf_watchlist(self, items: List[Dict]) -> int:
+        """
+        批量添加ETF到自选（单个事务，已存在的跳过）
+
+        Args:
+            items: [{"code": ..., "name": ...}, ...]，排序值按列表顺序递增
+
+        Returns:
+            实际新增的数量
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT MAX(sort_order) FROM etf_watchlist")
+            max_order = cursor.fetchone()[0] or 0
+
+            cursor.executemany(
+                """
+                INSERT OR IGNORE INTO etf_watchlist (code, name, sort_order, notes)
+                VALUES (?, ?, ?, '')
+                """,
+                [
+                    (item["code"], item["name"], max_order + i + 1)
+                    for i, item in enumerate(items)
+                ]
+            )
+            added = cursor.rowcount
+            conn.commit()
+            conn.close()
+            return added
+        except Exception as e:
+            print(f"批量添加ETF失败: {e}")
+            return 0
+
     def remove_from_etf_watchlist(self, code: str) -> bool:
         """从ETF自选中移除"""
         try:
@@ -450,3 +580,138 @@ class Database:
         result = cursor.fetchone()
         conn.close()
         return result is not None
+
+    def get_etf_watchlist_codes(self) -> set:
+        """获取ETF自选代码集合（一次查询，替代逐个 is_in_etf_watchlist）"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT code FROM etf_watchlist")
+        rows = cursor.fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    # ============ Top10扫描缓存 ============
+
+    def save_top10(self, scan_date: str, results: List[Dict]) -> bool:
+        """
+        保存某日的Top10扫描结果（覆盖当日旧结果）
+
+        results 中的 analysis 需为 dict（StrategyAnalysis.to_dict()）
+        """
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM top10_cache WHERE scan_date = ?", (scan_date,))
+            cursor.executemany(
+                """
+                INSERT INTO top10_cache
+                (scan_date, code, name, score, bullish_score, bearish_score, change_pct, analysis)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        scan_date,
+                        r["code"],
+                        r["name"],
+                        r["score"],
+                        r["bullish_score"],
+                        r["bearish_score"],
+                        r.get("change_pct", 0),
+                        # 分析结果中可能含numpy标量，转成Python原生类型
+                        json.dumps(
+                            r["analysis"],
+                            ensure_ascii=False,
+                            default=lambda o: o.item() if hasattr(o, "item") else str(o)
+                        )
+                    )
+                    for r in results
+                ]
+            )
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"保存Top10结果失败: {e}")
+            return False
+
+    def get_top10_cached(self, scan_date: str, limit: int = 10) -> List[Dict]:
+        """获取某日的Top10扫描结果，analysis 为 dict"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT code, name, score, bullish_score, bearish_score, change_pct, analysis, created_at
+            FROM top10_cache
+            WHERE scan_date = ?
+            ORDER BY score DESC
+            LIMIT ?
+            """,
+            (scan_date, limit)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+
+        result = []
+        for row in rows:
+            d = dict(row)
+            d["analysis"] = json.loads(d["analysis"] or "{}")
+            result.append(d)
+
+        return result
+
+    # ============ 分析结果缓存 ============
+
+    def save_analysis(self, code: str, trade_date: str, analysis: Dict) -> bool:
+        """保存个股分析结果（StrategyAnalysis.to_dict()），同一交易日覆盖"""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO analysis_cache (code, trade_date, action, score, analysis, updated_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))
+                """,
+                (
+                    code,
+                    trade_date,
+                    analysis.get("action"),
+                    analysis.get("bullish_score", 0) - analysis.get("bearish_score", 0),
+                    json.dumps(
+                        analysis,
+                        ensure_ascii=False,
+                        default=lambda o: o.item() if hasattr(o, "item") else str(o)
+                    )
+                )
+            )
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"保存分析结果失败: {e}")
+            return False
+
+    def load_analysis(self, code: str, trade_date: str, saved_after: Optional[str] = None) -> Optional[Dict]:
+        """
+        读取个股分析结果
+
+        Args:
+            code: 股票代码
+            trade_date: 交易日 YYYY-MM-DD
+            saved_after: 只接受该时间之后保存的结果（如 "2024-01-15 15:00:00"），None表示不限
+
+        Returns:
+            analysis dict，无记录返回None
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT analysis FROM analysis_cache
+            WHERE code = ? AND trade_date = ? AND updated_at >= ?
+            """,
+            (code, trade_date, saved_after or "")
+        )
+        row = cursor.fetchone()
+        conn.close()
+
+        return json.loads(row["analysis"]) if row else None
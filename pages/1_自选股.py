@@ -1,11 +1,16 @@
 """
 自选股管理页面 - 反转三兄弟策略分析
 """
+import hashlib
 import streamlit as st
+import pandas as pd
+import orjson
+from datetime import datetime
+from html import escape
 
-from data.fetcher import DataFetcher
-from signals.analyzer import StrategyAnalyzer, ActionType
-from database.models import Database
+from signals.analyzer import StrategyAnalyzer, StrategyAnalysis, ActionType
+from config import MARKET_CLOSE_TIME
+from utils.singletons import get_db, get_fetcher, get_analyzer
 
 st.set_page_config(
     page_title="自选股 - 反转三兄弟",
@@ -13,14 +18,44 @@ st.set_page_config(
     layout="wide"
 )
 
-# 初始化
-db = Database()
-analyzer = StrategyAnalyzer()
-fetcher = DataFetcher()
 
+# 初始化（跨重跑、跨页面共享）
+db = get_db()
+analyzer = get_analyzer()
+fetcher = get_fetcher()
 
-def render_action_badge(action: str, size: str = "normal"):
-    """渲染操作建议标签"""
+
+@st.cache_data(ttl=3600, max_entries=500, show_spinner=False)
+def _cached_analysis(code: str, name: str, days: int, day_key: str):
+    """
+    获取K线并分析（按交易日缓存）
+
+    页面每次交互都会重跑脚本，缓存后重跑直接命中结果；
+    day_key 为当天日期，跨日自动失效。
+    收盘后保存到数据库的结果当天不再变化，跨会话/重启直接读取。
+    """
+    saved = db.load_analysis(code, day_key, saved_after=f"{day_key} {MARKET_CLOSE_TIME}")
+    if saved:
+        return StrategyAnalysis.from_dict(saved)
+
+    df = fetcher.get_stock_data(code, days=days)
+    if df is None:
+        return None
+
+    analysis = analyzer.analyze(df, code, name)
+    if analysis:
+        db.save_analysis(code, day_key, analysis.to_dict())
+    return analysis
+
+
+@st.cache_data(ttl=600, max_entries=100, show_spinner=False)
+def _cached_search(keyword: str):
+    """搜索股票（缓存10分钟，重跑时不重复请求）"""
+    return fetcher.search_stock(keyword)
+
+
+def _build_action_badge(action: str, size: str = "normal"):
+    """生成操作建议标签HTML"""
     colors = {
         "买入": ("🟢", "#e8f5e9", "#2e7d32"),
         "加仓": ("🟢", "#e8f5e9", "#4caf50"),
@@ -44,243 +79,302 @@ def render_action_badge(action: str, size: str = "normal"):
     ">{emoji} {action}</span>"""
 
 
-def render_detailed_analysis(analysis, buy_info=None, code=None):
-    """渲染详细策略分析"""
-    if analysis is None:
-        st.warning("数据不足，无法分析")
-        return
+# 标签只有 操作类型 × 尺寸 几种组合，导入时预先生成
+_BADGE_HTML = {
+    (a.value, size): _build_action_badge(a.value, size)
+    for a in ActionType
+    for size in ("normal", "small")
+}
+
+
+def render_action_badge(action: str, size: str = "normal"):
+    """渲染操作建议标签"""
+    html = _BADGE_HTML.get((action, size))
+    return html if html is not None else _build_action_badge(action, size)
+
+
+# 提示框配色: 类型 -> (背景色, 文字色)
+_ALERT_COLORS = {
+    "success": ("#e8f5e9", "#2e7d32"),
+    "info": ("#e3f2fd", "#1565c0"),
+    "warning": ("#fff8e1", "#ef6c00"),
+    "error": ("#ffebee", "#c62828"),
+}
+
+
+def _alert(kind: str, text: str) -> str:
+    """提示框HTML（对应 st.success/info/warning/error）"""
+    bg, color = _ALERT_COLORS[kind]
+    return (f'<div style="background: {bg}; color: {color}; padding: 10px 14px; '
+            f'border-radius: 8px; margin: 6px 0;">{text}</div>')
+
+
+def _metric(label: str, value: str, delta: str = "", delta_color: str = "#616161") -> str:
+    """指标卡HTML（对应 st.metric）"""
+    delta_html = f'<div style="color: {delta_color}; font-size: 14px;">{delta}</div>' if delta else ""
+    return (f'<div style="font-size: 14px; color: #616161;">{label}</div>'
+            f'<div style="font-size: 28px;">{value}</div>{delta_html}')
+
+
+def _columns(*parts: str, weights=None) -> str:
+    """多列布局HTML（对应 st.columns）"""
+    weights = weights or [1] * len(parts)
+    cols = "".join(
+        f'<div style="flex: {w}; min-width: 0;">{p}</div>' for p, w in zip(parts, weights)
+    )
+    return f'<div style="display: flex; gap: 24px;">{cols}</div>'
+
+
+def _bullets(items) -> str:
+    """无序列表HTML"""
+    return "<ul>" + "".join(f"<li>{escape(str(i))}</li>" for i in items) + "</ul>"
+
+
+def _build_analysis_html(analysis, buy_info=None) -> str:
+    """把详细策略分析拼成一段HTML（纯函数，不调用Streamlit）"""
+    e = escape
+    parts = []
 
     # === 妈妈的持仓信息 ===
     if buy_info and buy_info.get("buy_price"):
         buy_price = buy_info["buy_price"]
-        buy_date = buy_info.get("buy_date", "")
-        buy_qty = buy_info.get("buy_quantity", 0)
+        buy_date = buy_info.get("buy_date") or ""
+        buy_qty = buy_info.get("buy_quantity") or 0
         current_price = analysis.current_price
 
         profit_pct = ((current_price - buy_price) / buy_price) * 100
-        profit_amount = (current_price - buy_price) * (buy_qty or 0)
+        profit_amount = (current_price - buy_price) * buy_qty
+        profit_color = "#2e7d32" if profit_pct >= 0 else "#c62828"
 
-        if profit_pct >= 0:
-            profit_color = "green"
-            profit_emoji = "📈"
-        else:
-            profit_color = "red"
-            profit_emoji = "📉"
-
-        st.markdown("### 💰 妈妈的持仓情况")
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("买入价格", f"¥{buy_price:.2f}", f"买入日期: {buy_date}")
-        with col2:
-            st.metric("当前价格", f"¥{current_price:.2f}",
-                     f"{profit_pct:+.2f}%", delta_color="normal" if profit_pct >= 0 else "inverse")
-        with col3:
-            if buy_qty:
-                st.metric("持仓数量", f"{buy_qty}股", f"盈亏: ¥{profit_amount:+.0f}")
+        parts.append("<h3>💰 妈妈的持仓情况</h3>")
+        parts.append(_columns(
+            _metric("买入价格", f"¥{buy_price:.2f}", f"买入日期: {e(buy_date)}"),
+            _metric("当前价格", f"¥{current_price:.2f}", f"{profit_pct:+.2f}%", profit_color),
+            _metric("持仓数量", f"{buy_qty}股", f"盈亏: ¥{profit_amount:+.0f}", profit_color) if buy_qty else ""
+        ))
 
         # 个性化建议
-        st.markdown("**💡 给妈妈的建议：**")
+        parts.append("<p><b>💡 给妈妈的建议：</b></p>")
         if profit_pct >= 20:
-            st.success(f"🎉 恭喜妈妈！已经赚了{profit_pct:.1f}%，可以考虑卖掉一部分锁定利润。")
+            parts.append(_alert("success", f"🎉 恭喜妈妈！已经赚了{profit_pct:.1f}%，可以考虑卖掉一部分锁定利润。"))
         elif profit_pct >= 10:
-            st.info(f"👍 不错哦！赚了{profit_pct:.1f}%，可以继续持有，但要注意设置止盈点。")
+            parts.append(_alert("info", f"👍 不错哦！赚了{profit_pct:.1f}%，可以继续持有，但要注意设置止盈点。"))
         elif profit_pct >= 0:
-            st.info(f"📊 小赚{profit_pct:.1f}%，继续观察，不要急着卖。")
+            parts.append(_alert("info", f"📊 小赚{profit_pct:.1f}%，继续观察，不要急着卖。"))
         elif profit_pct >= -5:
-            st.warning(f"😐 小亏{abs(profit_pct):.1f}%，正常波动，先别慌。")
+            parts.append(_alert("warning", f"😐 小亏{abs(profit_pct):.1f}%，正常波动，先别慌。"))
         elif profit_pct >= -10:
-            st.warning(f"😟 亏了{abs(profit_pct):.1f}%，要注意了。如果趋势转弱，考虑减仓。")
+            parts.append(_alert("warning", f"😟 亏了{abs(profit_pct):.1f}%，要注意了。如果趋势转弱，考虑减仓。"))
         else:
-            st.error(f"😰 亏了{abs(profit_pct):.1f}%，建议认真看下面的分析，考虑是否止损。")
+            parts.append(_alert("error", f"😰 亏了{abs(profit_pct):.1f}%，建议认真看下面的分析，考虑是否止损。"))
 
-        st.divider()
+        parts.append("<hr>")
 
     # === 操作建议（最醒目）===
-    st.markdown("### 综合建议")
-
-    col1, col2 = st.columns([1, 2])
-    with col1:
-        st.markdown(render_action_badge(analysis.action.value), unsafe_allow_html=True)
-        st.markdown(f"**风险等级**: {analysis.risk_level}")
-        st.markdown(f"**仓位建议**: {analysis.position_advice}")
-
-    with col2:
-        st.markdown(f"**判断依据**: {analysis.action_reason}")
-        st.markdown(f"**详细分析**: {analysis.action_detail}")
-
-    st.divider()
+    parts.append("<h3>综合建议</h3>")
+    parts.append(_columns(
+        render_action_badge(analysis.action.value)
+        + f"<p><b>风险等级</b>: {e(analysis.risk_level)}</p>"
+        + f"<p><b>仓位建议</b>: {e(analysis.position_advice)}</p>",
+        f"<p><b>判断依据</b>: {e(analysis.action_reason)}</p>"
+        + f"<p><b>详细分析</b>: {e(analysis.action_detail)}</p>",
+        weights=[1, 2]
+    ))
+    parts.append("<hr>")
 
     # === 多空因素对比 ===
-    st.markdown("### 多空因素分析")
-
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.markdown("**🟢 看多因素**")
-        if analysis.bullish_factors:
-            for f in analysis.bullish_factors:
-                st.markdown(f"- {f}")
-        else:
-            st.markdown("*暂无明显看多信号*")
-
-    with col2:
-        st.markdown("**🔴 看空因素**")
-        if analysis.bearish_factors:
-            for f in analysis.bearish_factors:
-                st.markdown(f"- {f}")
-        else:
-            st.markdown("*暂无明显看空信号*")
-
-    st.divider()
+    parts.append("<h3>多空因素分析</h3>")
+    parts.append(_columns(
+        "<p><b>🟢 看多因素</b></p>"
+        + (_bullets(analysis.bullish_factors) if analysis.bullish_factors else "<p><i>暂无明显看多信号</i></p>"),
+        "<p><b>🔴 看空因素</b></p>"
+        + (_bullets(analysis.bearish_factors) if analysis.bearish_factors else "<p><i>暂无明显看空信号</i></p>")
+    ))
+    parts.append("<hr>")
 
     # === 反转形态 ===
-    st.markdown("### 反转三兄弟形态")
+    parts.append("<h3>反转三兄弟形态</h3>")
     if analysis.patterns:
         for p in analysis.patterns:
             emoji = "🟢" if p["type"] == "看涨" else ("🔴" if p["type"] == "看跌" else "⚪")
             bg = '#e8f5e9' if p['type'] == '看涨' else '#ffebee' if p['type'] == '看跌' else '#f5f5f5'
             position = p.get('position_advice', '')
-            position_text = f"<br><b>仓位建议: {position}</b>" if position else ""
-            st.markdown(
+            position_text = f"<br><b>仓位建议: {e(position)}</b>" if position else ""
+            parts.append(
                 f"""<div style="background: {bg}; padding: 10px; border-radius: 8px; margin: 5px 0;">
-                {emoji} <b>{p['name']}</b> ({p['type']}, 强度: {p['strength']})<br>
-                <small>{p['desc']}</small>{position_text}</div>""",
-                unsafe_allow_html=True
+                {emoji} <b>{e(p['name'])}</b> ({e(p['type'])}, 强度: {e(str(p['strength']))})<br>
+                <small>{e(p['desc'])}</small>{position_text}</div>"""
             )
     else:
-        st.info("今日无明显反转形态")
+        parts.append(_alert("info", "今日无明显反转形态"))
 
     # 显示形态分析说明（为什么没形成）
     if analysis.pattern_analysis:
-        st.markdown("**📋 形态分析详情:**")
-        for reason in analysis.pattern_analysis:
-                st.markdown(f"- {reason}")
+        parts.append("<p><b>📋 形态分析详情:</b></p>")
+        parts.append(_bullets(analysis.pattern_analysis))
 
-    st.divider()
+    parts.append("<hr>")
 
     # === 关键指标 ===
-    col1, col2, col3 = st.columns(3)
+    vol_emoji = "📈" if analysis.volume_status == "放量" else ("📉" if analysis.volume_status == "缩量" else "➖")
+    volume_html = (
+        "<h3>量价分析</h3>"
+        f"<p><b>量能</b>: {vol_emoji} {e(analysis.volume_status)}</p>"
+        f"<p><b>量比</b>: {analysis.volume_ratio}</p>"
+        f"<p><b>结论</b>: {e(analysis.volume_price_conclusion)}</p>"
+    )
+    if analysis.price_new_high:
+        volume_html += _alert("success", "🔺 创近期新高")
+    if analysis.price_new_low:
+        volume_html += _alert("error", "🔻 创近期新低")
+
+    shadow_kind, shadow_emoji = ("warning", "⚠️") if analysis.upper_shadow_warning else ("success", "✅")
+    trend_html = (
+        "<h3>趋势分析</h3>"
+        f"<p><b>5日趋势</b>: {e(analysis.trend_5d)}</p>"
+        f"<p><b>10日趋势</b>: {e(analysis.trend_10d)}</p>"
+        f"<p><b>20日趋势</b>: {e(analysis.trend_20d)}</p>"
+        "<hr>"
+        "<h3>上影线分析</h3>"
+        + _alert(shadow_kind, f"{shadow_emoji} 上影线/实体比: {analysis.upper_shadow_ratio}")
+        + f"<small>{e(analysis.upper_shadow_detail)}</small>"
+    )
+
+    macd_html = f"<h3>MACD</h3><p><b>状态</b>: {e(analysis.macd_status)}</p>"
+    if analysis.macd_cross == "金叉":
+        macd_html += _alert("success", "🟢 金叉信号")
+    elif analysis.macd_cross == "死叉":
+        macd_html += _alert("error", "🔴 死叉信号")
+    else:
+        macd_html += "<p>无交叉信号</p>"
 
-    with col1:
-        st.markdown("### 量价分析")
-        vol_emoji = "📈" if analysis.volume_status == "放量" else ("📉" if analysis.volume_status == "缩量" else "➖")
-        st.markdown(f"**量能**: {vol_emoji} {analysis.volume_status}")
-        st.markdown(f"**量比**: {analysis.volume_ratio}")
-        st.markdown(f"**结论**: {analysis.volume_price_conclusion}")
-
-        if analysis.price_new_high:
-            st.success("🔺 创近期新高")
-        if analysis.price_new_low:
-            st.error("🔻 创近期新低")
-
-    with col2:
-        st.markdown("### 趋势分析")
-        st.markdown(f"**5日趋势**: {analysis.trend_5d}")
-        st.markdown(f"**10日趋势**: {analysis.trend_10d}")
-        st.markdown(f"**20日趋势**: {analysis.trend_20d}")
-
-        st.markdown("---")
-        st.markdown("### 上影线分析")
-        if analysis.upper_shadow_warning:
-            st.warning(f"⚠️ 上影线/实体比: {analysis.upper_shadow_ratio}")
-        else:
-            st.success(f"✅ 上影线/实体比: {analysis.upper_shadow_ratio}")
-        st.caption(analysis.upper_shadow_detail)
-
-    with col3:
-        st.markdown("### MACD")
-        st.markdown(f"**状态**: {analysis.macd_status}")
-        if analysis.macd_cross == "金叉":
-            st.success("🟢 金叉信号")
-        elif analysis.macd_cross == "死叉":
-            st.error("🔴 死叉信号")
-        else:
-            st.markdown("无交叉信号")
+    parts.append(_columns(volume_html, trend_html, macd_html))
 
     # === 压力/支撑详细分析（独立section）===
-    st.divider()
-    st.markdown("### 📊 压力线/支撑线详细分析")
-    st.markdown(f"**当前价格: {analysis.current_price:.2f}**")
-
-    col_s, col_r = st.columns(2)
-
-    with col_s:
-        st.markdown("**🟢 支撑线（来自大阳线）**")
-        st.caption("支撑线是股价下跌时可能止跌的位置")
-        if analysis.support_lines:
-            ref_date = analysis.support_lines[0].get("ref_date", "")
-            days_ago = analysis.support_lines[0].get("days_ago", 0)
-            ref_open = analysis.support_lines[0].get("ref_open", 0)
-            ref_close = analysis.support_lines[0].get("ref_close", 0)
-            st.markdown(f"📅 参考: {ref_date}的大阳线（{days_ago}天前）")
-            st.markdown(f"当日开盘{ref_open} → 收盘{ref_close}")
-            st.markdown("---")
-            for s in analysis.support_lines:
-                vs_current = s.get("vs_current", "")
-                color = "green" if "高于" in vs_current else "red"
-                st.markdown(f"**{s['name']}**: ¥{s['price']}")
-                st.markdown(f"<span style='color:{color}'>{vs_current}</span>", unsafe_allow_html=True)
-                st.caption(f"计算: {s.get('calculation', '')}")
-            if analysis.support_break_status:
-                st.error(f"⚠️ {analysis.support_break_status}")
-            elif analysis.near_support:
-                st.success("📍 当前价格接近支撑位，可能有支撑")
-        else:
-            st.info("最近60天无大阳线，暂无支撑线参考")
-
-    with col_r:
-        st.markdown("**🔴 压力线（来自大阴线）**")
-        st.caption("压力线是股价上涨时可能受阻的位置")
-        if analysis.resistance_lines:
-            ref_date = analysis.resistance_lines[0].get("ref_date", "")
-            days_ago = analysis.resistance_lines[0].get("days_ago", 0)
-            ref_open = analysis.resistance_lines[0].get("ref_open", 0)
-            ref_close = analysis.resistance_lines[0].get("ref_close", 0)
-            st.markdown(f"📅 参考: {ref_date}的大阴线（{days_ago}天前）")
-            st.markdown(f"当日开盘{ref_open} → 收盘{ref_close}")
-            st.markdown("---")
-            for r in analysis.resistance_lines:
-                vs_current = r.get("vs_current", "")
-                color = "red" if "高于" in vs_current else "green"
-                st.markdown(f"**{r['name']}**: ¥{r['price']}")
-                st.markdown(f"<span style='color:{color}'>{vs_current}</span>", unsafe_allow_html=True)
-                st.caption(f"计算: {r.get('calculation', '')}")
-            if analysis.resistance_break_status:
-                if "放量突破" in analysis.resistance_break_status:
-                    st.success(f"🚀 {analysis.resistance_break_status}")
-                else:
-                    st.warning(f"📍 {analysis.resistance_break_status}")
-            elif analysis.near_resistance:
-                st.warning("📍 当前价格接近压力位，上涨可能受阻")
-        else:
-            st.info("最近60天无大阴线，暂无压力线参考")
+    parts.append("<hr>")
+    parts.append("<h3>📊 压力线/支撑线详细分析</h3>")
+    parts.append(f"<p><b>当前价格: {analysis.current_price:.2f}</b></p>")
+
+    support_html = (
+        "<p><b>🟢 支撑线（来自大阳线）</b></p>"
+        "<small>支撑线是股价下跌时可能止跌的位置</small>"
+    )
+    if analysis.support_lines:
+        ref = analysis.support_lines[0]
+        support_html += (
+            f"<p>📅 参考: {e(str(ref.get('ref_date', '')))}的大阳线（{ref.get('days_ago', 0)}天前）</p>"
+            f"<p>当日开盘{ref.get('ref_open', 0)} → 收盘{ref.get('ref_close', 0)}</p><hr>"
+        )
+        for s in analysis.support_lines:
+            vs_current = s.get("vs_current", "")
+            color = "green" if "高于" in vs_current else "red"
+            support_html += (
+                f"<p><b>{e(s['name'])}</b>: ¥{s['price']}</p>"
+                f"<p><span style='color:{color}'>{e(vs_current)}</span></p>"
+                f"<small>计算: {e(s.get('calculation', ''))}</small>"
+            )
+        if analysis.support_break_status:
+            support_html += _alert("error", f"⚠️ {e(analysis.support_break_status)}")
+        elif analysis.near_support:
+            support_html += _alert("success", "📍 当前价格接近支撑位，可能有支撑")
+    else:
+        support_html += _alert("info", "最近60天无大阳线，暂无支撑线参考")
+
+    resistance_html = (
+        "<p><b>🔴 压力线（来自大阴线）</b></p>"
+        "<small>压力线是股价上涨时可能受阻的位置</small>"
+    )
+    if analysis.resistance_lines:
+        ref = analysis.resistance_lines[0]
+        resistance_html += (
+            f"<p>📅 参考: {e(str(ref.get('ref_date', '')))}的大阴线（{ref.get('days_ago', 0)}天前）</p>"
+            f"<p>当日开盘{ref.get('ref_open', 0)} → 收盘{ref.get('ref_close', 0)}</p><hr>"
+        )
+        for r in analysis.resistance_lines:
+            vs_current = r.get("vs_current", "")
+            color = "red" if "高于" in vs_current else "green"
+            resistance_html += (
+                f"<p><b>{e(r['name'])}</b>: ¥{r['price']}</p>"
+                f"<p><span style='color:{color}'>{e(vs_current)}</span></p>"
+                f"<small>计算: {e(r.get('calculation', ''))}</small>"
+            )
+        if analysis.resistance_break_status:
+            if "放量突破" in analysis.resistance_break_status:
+                resistance_html += _alert("success", f"🚀 {e(analysis.resistance_break_status)}")
+            else:
+                resistance_html += _alert("warning", f"📍 {e(analysis.resistance_break_status)}")
+        elif analysis.near_resistance:
+            resistance_html += _alert("warning", "📍 当前价格接近压力位，上涨可能受阻")
+    else:
+        resistance_html += _alert("info", "最近60天无大阴线，暂无压力线参考")
 
-    # 操作提示（通俗易懂版）
-    st.markdown("---")
-    st.markdown("""
-    **💡 妈妈看这里 - 简单操作指南：**
-    - 如果股价**跌破支撑1/2** → 说明跌得比较深了，建议卖掉30-50%
-    - 如果股价**跌破支撑1/3** → 小跌，可以先卖10-20%观望
-    - 如果股价**放量突破压力** → 好兆头！可以适当买入
-    - 如果股价**缩量突破压力** → 力度不够，先别追，等回调
-    """)
+    parts.append(_columns(support_html, resistance_html))
 
-    st.divider()
+    # 操作提示（通俗易懂版）
+    parts.append("<hr>")
+    parts.append(
+        "<p><b>💡 妈妈看这里 - 简单操作指南：</b></p><ul>"
+        "<li>如果股价<b>跌破支撑1/2</b> → 说明跌得比较深了，建议卖掉30-50%</li>"
+        "<li>如果股价<b>跌破支撑1/3</b> → 小跌，可以先卖10-20%观望</li>"
+        "<li>如果股价<b>放量突破压力</b> → 好兆头！可以适当买入</li>"
+        "<li>如果股价<b>缩量突破压力</b> → 力度不够，先别追，等回调</li></ul>"
+    )
+    parts.append("<hr>")
 
     # === 均线分析 ===
-    st.markdown("### 均线状态 (7/18/30/89日)")
-    st.markdown(f"**综合判断**: {analysis.ma_support}")
+    parts.append("<h3>均线状态 (7/18/30/89日)</h3>")
+    parts.append(f"<p><b>综合判断</b>: {e(analysis.ma_support)}</p>")
 
     if analysis.ma_status:
-        cols = st.columns(len(analysis.ma_status))
-        for i, (ma_name, ma_info) in enumerate(analysis.ma_status.items()):
-            with cols[i]:
-                status = "🟢" if ma_info["above"] else "🔴"
-                st.metric(
-                    label=f"{status} {ma_name}",
-                    value=f"{ma_info['value']:.2f}",
-                    delta=f"{ma_info['diff_pct']:+.1f}%"
-                )
+        parts.append(_columns(*[
+            _metric(
+                f"{'🟢' if ma_info['above'] else '🔴'} {e(ma_name)}",
+                f"{ma_info['value']:.2f}",
+                f"{ma_info['diff_pct']:+.1f}%",
+                "#2e7d32" if ma_info["diff_pct"] >= 0 else "#c62828"
+            )
+            for ma_name, ma_info in analysis.ma_status.items()
+        ]))
+
+    return "".join(parts)
+
+
+def _analysis_digest(analysis: StrategyAnalysis) -> str:
+    """分析结果全部字段的摘要：HTML里展示的形态、量比、支撑压力、均线、评分等任一变化都会改变摘要"""
+    payload = orjson.dumps(
+        analysis.to_dict(),
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        default=str
+    )
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def _cached_analysis_html(code: str, signature: str, buy_key: tuple, _analysis) -> str:
+    """
+    按 (代码, 分析摘要, 买入信息) 缓存详细分析HTML
+
+    _analysis 以下划线开头不参与缓存键计算，分析变化由 signature（_analysis_digest）体现。
+    """
+    buy_info = dict(zip(("buy_price", "buy_date", "buy_quantity"), buy_key))
+    return _build_analysis_html(_analysis, buy_info)
+
+
+def render_detailed_analysis(analysis, buy_info=None, code=None):
+    """渲染详细策略分析（整块HTML一次输出，重跑时直接命中缓存）"""
+    if analysis is None:
+        st.warning("数据不足，无法分析")
+        return
+
+    # 分析签名: 整个分析结果的摘要
+    signature = _analysis_digest(analysis)
+    buy_info = buy_info or {}
+    buy_key = (buy_info.get("buy_price"), buy_info.get("buy_date"), buy_info.get("buy_quantity"))
+
+    st.markdown(
+        _cached_analysis_html(code or analysis.code, signature, buy_key, analysis),
+        unsafe_allow_html=True
+    )
 
 
 def main():
@@ -288,40 +382,52 @@ def main():
 
     # ============ 添加股票 ============
     with st.expander("➕ 添加股票", expanded=False):
-        col1, col2 = st.columns([3, 1])
+        # 放在表单里，输入过程中不触发重跑，点搜索才提交
+        with st.form("search_form"):
+            col1, col2 = st.columns([3, 1])
 
-        with col1:
-            search_keyword = st.text_input(
-                "搜索股票",
-                placeholder="输入股票代码，如 600519、688001",
-                key="stock_search"
-            )
+            with col1:
+                search_keyword = st.text_input(
+                    "搜索股票",
+                    placeholder="输入股票代码，如 600519、688001",
+                    key="stock_search"
+                )
 
-        with col2:
-            st.write("")
-            st.write("")
-            search_btn = st.button("🔍 搜索", use_container_width=True)
+            with col2:
+                st.write("")
+                st.write("")
+                search_btn = st.form_submit_button("🔍 搜索", use_container_width=True)
 
-        if search_keyword and (search_btn or len(search_keyword) >= 4):
-            results = fetcher.search_stock(search_keyword)
+        # 记住已提交的关键字，勾选添加等后续重跑时结果不丢
+        if search_btn:
+            st.session_state["search_submitted"] = search_keyword.strip()
+        keyword = st.session_state.get("search_submitted", "")
+
+        if keyword:
+            results = _cached_search(keyword)
 
             if results:
-                for stock in results[:8]:
-                    code = stock["code"]
-                    name = stock["name"]
-                    in_watchlist = db.is_in_watchlist(code)
-
-                    cols = st.columns([2, 3, 2])
-                    cols[0].write(code)
-                    cols[1].write(name)
-
-                    if in_watchlist:
-                        cols[2].write("✅ 已添加")
-                    else:
-                        if cols[2].button("➕ 添加", key=f"add_{code}"):
-                            if db.add_to_watchlist(code, name):
-                                st.success(f"已添加 {code} {name}")
-                                st.rerun()
+                watchlist_codes = db.get_watchlist_codes()
+                with st.form("add_form"):
+                    selected = []
+                    for stock in results[:8]:
+                        code = stock["code"]
+                        name = stock["name"]
+
+                        cols = st.columns([2, 3, 2])
+                        cols[0].write(code)
+                        cols[1].write(name)
+
+                        if code in watchlist_codes:
+                            cols[2].write("✅ 已添加")
+                        elif cols[2].checkbox("添加", key=f"add_{code}"):
+                            selected.append(stock)
+
+                    if st.form_submit_button("➕ 添加选中"):
+                        added = [s for s in selected if db.add_to_watchlist(s["code"], s["name"])]
+                        if added:
+                            st.success("已添加 " + "、".join(f"{s['code']} {s['name']}" for s in added))
+                            st.rerun()
             else:
                 st.warning("未找到股票")
 
@@ -343,41 +449,38 @@ def main():
 
     st.write(f"共 {len(watchlist)} 只股票")
 
-    # 分析所有股票
-    analysis_results = {
-        "买入": [],
-        "加仓": [],
-        "减仓": [],
-        "卖出": [],
-        "持有观望": []
-    }
+    day_key = datetime.now().strftime("%Y-%m-%d")
 
+    # 分析所有股票（结果同时写入数据库的当日分析表）
+    analyses = {}
     with st.spinner("正在分析自选股..."):
         for stock in watchlist:
-            code = stock["code"]
-            name = stock["name"]
-
-            df = fetcher.get_stock_data(code, days=120)
-            if df is None:
-                continue
-
-            analysis = analyzer.analyze(df, code, name)
-            if analysis is None:
-                continue
-
-            analysis_results[analysis.action.value].append({
-                "code": code,
-                "name": name,
-                "analysis": analysis,
-                "price": analysis.current_price
-            })
+            analysis = _cached_analysis(stock["code"], stock["name"], StrategyAnalyzer.LOOKBACK_DAYS, day_key)
+            if analysis is not None:
+                analyses[stock["code"]] = analysis
+
+    # 按手上的分析结果分组，组内按评分（多方得分-空方得分）降序；
+    # 分组和卡片用同一个分析结果，不会出现分组与卡片上的建议不一致。排序稳定，同分保持自选顺序
+    analysis_results = {action.value: [] for action in ActionType}
+    ranked = sorted(analyses.items(), key=lambda kv: kv[1].bullish_score - kv[1].bearish_score, reverse=True)
+    for code, analysis in ranked:
+        analysis_results[analysis.action.value].append({
+            "code": code,
+            "name": analysis.name,
+            "analysis": analysis,
+            "price": analysis.current_price
+        })
+
+    # 一次查出所有买入信息，避免每只股票单独查库
+    buy_map = db.get_buy_infos([item["code"] for bucket in analysis_results.values() for item in bucket])
 
     # ============ 分类显示 ============
 
+    @st.fragment
     def render_stock_item(item, expanded=True):
-        """渲染单只股票的详细信息"""
+        """渲染单只股票的详细信息（fragment: 卡片内的输入只重跑本卡片）"""
         code = item['code']
-        buy_info = db.get_buy_info(code)
+        buy_info = buy_map[code]
 
         with st.expander(f"**{code}** {item['name']} - {item['analysis'].action_reason}", expanded=expanded):
             # 操作按钮行
@@ -387,7 +490,7 @@ def main():
             with col3:
                 if st.button("🗑️ 删除", key=f"del_{code}"):
                     db.remove_from_watchlist(code)
-                    st.rerun()
+                    st.rerun(scope="app")
 
             # 买入信息录入
             with st.container():
@@ -427,13 +530,39 @@ def main():
                             buy_quantity=buy_qty if buy_qty > 0 else None
                         )
                         st.success("已保存!")
-                        st.rerun()
+                        # 买入信息在页面级一次性查出，保存后需整页重跑刷新
+                        st.rerun(scope="app")
 
             st.divider()
 
-            # 获取最新buy_info
-            buy_info_updated = db.get_buy_info(code)
-            render_detailed_analysis(item['analysis'], buy_info_updated, code)
+            # 保存后会立即rerun，这里的buy_info即为最新
+            render_detailed_analysis(item['analysis'], buy_info, code)
+
+    def render_bucket_table(bucket, key):
+        """折叠分组用表格概览，只为选中的股票渲染详情卡片"""
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "代码": i["code"],
+                    "名称": i["name"],
+                    "现价": round(i["price"], 2),
+                    "理由": i["analysis"].action_reason
+                }
+                for i in bucket
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+        items = {i["code"]: i for i in bucket}
+        selected = st.selectbox(
+            "查看详情",
+            [None] + list(items),
+            format_func=lambda c: "选择股票查看详细分析" if c is None else f"{c} {items[c]['name']}",
+            key=f"detail_{key}"
+        )
+        if selected:
+            render_stock_item(items[selected], expanded=True)
 
     # 买入信号
     if analysis_results["买入"]:
@@ -453,22 +582,19 @@ def main():
     if analysis_results["减仓"]:
         st.markdown("## 🟠 减仓信号")
         st.caption("这些股票出现转弱迹象，可以卖掉一部分")
-        for item in analysis_results["减仓"]:
-            render_stock_item(item, expanded=False)
+        render_bucket_table(analysis_results["减仓"], "减仓")
 
     # 卖出信号
     if analysis_results["卖出"]:
         st.markdown("## 🔴 卖出信号")
         st.caption("这些股票建议尽快卖出")
-        for item in analysis_results["卖出"]:
-            render_stock_item(item, expanded=False)
+        render_bucket_table(analysis_results["卖出"], "卖出")
 
     # 持有观望
     if analysis_results["持有观望"]:
         st.markdown("## ⚪ 持有观望")
         st.caption("这些股票暂时没有明确信号，先拿着别动")
-        for item in analysis_results["持有观望"]:
-            render_stock_item(item, expanded=False)
+        render_bucket_table(analysis_results["持有观望"], "持有观望")
 
 
 if __name__ == "__main__":
@@ -5,11 +5,10 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import time
 
-from data.fetcher import DataFetcher
-from signals.analyzer import StrategyAnalyzer, ActionType
-from database.models import Database
+from signals.analyzer import StrategyAnalyzer, StrategyAnalysis, ActionType
+from signals.scanner import scan_market
+from utils.singletons import get_db, get_fetcher, get_analyzer
 
 st.set_page_config(
     page_title="Top10推荐 - 反转三兄弟",
@@ -17,14 +16,28 @@ st.set_page_config(
     layout="wide"
 )
 
-# 初始化
-db = Database()
-analyzer = StrategyAnalyzer()
-fetcher = DataFetcher()
 
+# 初始化（跨重跑、跨页面共享）
+db = get_db()
+analyzer = get_analyzer()
+fetcher = get_fetcher()
 
-def render_action_badge(action: str):
-    """渲染操作建议标签"""
+
+@st.cache_data(ttl=3600, max_entries=500, show_spinner=False)
+def _cached_analysis(code: str, name: str, days: int, day_key: str):
+    """
+    获取K线并分析（按交易日缓存）
+
+    重复扫描时直接命中结果；day_key 为当天日期，跨日自动失效。
+    """
+    df = fetcher.get_stock_data(code, days=days)
+    if df is None or len(df) < 30:
+        return None
+    return analyzer.analyze(df, code, name)
+
+
+def _build_action_badge(action: str):
+    """生成操作建议标签HTML"""
     colors = {
         "买入": ("🟢", "#e8f5e9", "#2e7d32"),
         "加仓": ("🟢", "#e8f5e9", "#4caf50"),
@@ -44,6 +57,16 @@ def render_action_badge(action: str):
     ">{emoji} {action}</span>"""
 
 
+# 标签只有几种操作类型，导入时预先生成
+_BADGE_HTML = {a.value: _build_action_badge(a.value) for a in ActionType}
+
+
+def render_action_badge(action: str):
+    """渲染操作建议标签"""
+    html = _BADGE_HTML.get(action)
+    return html if html is not None else _build_action_badge(action)
+
+
 def render_stock_detail(analysis, show_add_button=True):
     """渲染股票详细分析"""
     col1, col2 = st.columns([1, 2])
@@ -83,60 +106,45 @@ def render_stock_detail(analysis, show_add_button=True):
             st.markdown(f"- {emoji} {p['name']}: {p['desc']}")
 
 
-def scan_market_for_top10():
-    """扫描市场，找到评分最高的10只股票"""
-    st.info("正在扫描市场活跃股票...")
+@st.fragment
+def render_add_button(code: str, name: str, in_watchlist: bool):
+    """加自选按钮（fragment: 点击只重跑按钮本身，不重新渲染整个榜单）"""
+    if in_watchlist:
+        st.write("✅ 已自选")
+        return
 
-    # 获取活跃股票列表
-    stocks = fetcher.get_stocks_for_scan(limit=150)
+    if st.button("➕ 加自选", key=f"add_{code}"):
+        db.add_to_watchlist(code, name)
+        st.success(f"已添加 {name}")
 
-    if not stocks:
-        st.error("获取股票列表失败")
-        return []
 
-    st.write(f"共获取 {len(stocks)} 只活跃股票，正在分析...")
+def scan_market_for_top10():
+    """扫描市场，找到评分最高的10只股票，并写入数据库供后续直接读取"""
+    st.info("正在扫描市场活跃股票...")
 
-    results = []
+    day_key = datetime.now().strftime("%Y-%m-%d")
     progress = st.progress(0)
 
-    for i, stock in enumerate(stocks):
-        code = stock["code"]
-        name = stock["name"]
-
-        try:
-            df = fetcher.get_stock_data(code, days=60)
-            if df is not None and len(df) >= 30:
-                analysis = analyzer.analyze(df, code, name)
-                if analysis:
-                    # 计算综合评分
-                    bullish_score = len([f for f in analysis.bullish_factors if "【强】" in f]) * 3 + \
-                                    len([f for f in analysis.bullish_factors if "【中】" in f]) * 1
-                    bearish_score = len([f for f in analysis.bearish_factors if "【强】" in f]) * 3 + \
-                                    len([f for f in analysis.bearish_factors if "【中】" in f]) * 1
-                    score = bullish_score - bearish_score
-
-                    # 只保留正分的股票（偏多）
-                    if score > 0:
-                        results.append({
-                            "code": code,
-                            "name": name,
-                            "score": score,
-                            "bullish_score": bullish_score,
-                            "bearish_score": bearish_score,
-                            "analysis": analysis,
-                            "change_pct": stock.get("change_pct", 0)
-                        })
-        except:
-            pass
-
-        progress.progress((i + 1) / len(stocks))
-        time.sleep(0.05)
+    top10 = scan_market(
+        fetcher,
+        analyze_fn=lambda code, name: _cached_analysis(code, name, StrategyAnalyzer.LOOKBACK_DAYS, day_key),
+        on_progress=lambda done, total: progress.progress(done / total)
+    )
 
     progress.empty()
 
-    # 按评分排序，取前10
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:10]
+    if top10:
+        db.save_top10(day_key, [{**item, "analysis": item["analysis"].to_dict()} for item in top10])
+
+    return top10
+
+
+def load_cached_top10(scan_date: str):
+    """读取后台任务（scripts/refresh_top10.py）保存的扫描结果"""
+    rows = db.get_top10_cached(scan_date)
+    for row in rows:
+        row["analysis"] = StrategyAnalysis.from_dict(row["analysis"])
+    return rows
 
 
 def main():
@@ -147,10 +155,12 @@ def main():
     with col1:
         scan_btn = st.button("🔍 开始扫描市场", type="primary")
     with col2:
-        st.caption("扫描约150只活跃股票，耗时约2-3分钟")
+        st.caption("扫描约150只活跃股票，粗筛后精选30只分析，耗时约10秒")
 
     st.divider()
 
+    today = datetime.now().strftime("%Y-%m-%d")
+
     if scan_btn:
         top10 = scan_market_for_top10()
 
@@ -159,13 +169,22 @@ def main():
             return
 
         st.success(f"扫描完成！找到 {len(top10)} 只推荐股票")
+    else:
+        # 优先展示后台任务已算好的当日结果
+        top10 = load_cached_top10(today)
+        if top10:
+            st.success(f"今日推荐（扫描于 {top10[0]['created_at']}），如需最新结果可重新扫描")
+
+    if top10:
+        watchlist_codes = db.get_watchlist_codes()
 
         # 一键添加按钮
         if st.button("📥 一键添加全部到自选股"):
             added = 0
             for item in top10:
-                if not db.is_in_watchlist(item["code"]):
+                if item["code"] not in watchlist_codes:
                     db.add_to_watchlist(item["code"], item["name"])
+                    watchlist_codes.add(item["code"])
                     added += 1
             st.success(f"已添加 {added} 只新股票到自选股")
 
@@ -188,13 +207,7 @@ def main():
                 # 添加到自选按钮
                 col1, col2 = st.columns([4, 1])
                 with col2:
-                    if not db.is_in_watchlist(item["code"]):
-                        if st.button("➕ 加自选", key=f"add_{item['code']}"):
-                            db.add_to_watchlist(item["code"], item["name"])
-                            st.success(f"已添加 {item['name']}")
-                            st.rerun()
-                    else:
-                        st.write("✅ 已自选")
+                    render_add_button(item["code"], item["name"], item["code"] in watchlist_codes)
 
                 # 详细分析
                 render_stock_detail(analysis, show_add_button=False)
@@ -205,9 +218,10 @@ def main():
         ### 扫描逻辑
 
         1. **获取活跃股票**: 按成交额排序，获取前150只活跃股票
-        2. **逐只分析**: 对每只股票进行反转三兄弟策略分析
-        3. **综合评分**: 计算多空因素得分（强信号3分，中信号1分）
-        4. **排序推荐**: 按综合得分排序，推荐前10只
+        2. **行情粗筛**: 批量获取实时行情，按量比、涨跌幅、阴阳线打粗分，保留前30只
+        3. **逐只分析**: 对每只股票进行反转三兄弟策略分析
+        4. **综合评分**: 计算多空因素得分（强信号3分，中信号1分）
+        5. **排序推荐**: 按综合得分排序，推荐前10只
 
         ### 评分规则
 
@@ -223,6 +237,7 @@ def main():
         - 推荐的股票仅供参考，请结合自身判断
         - 建议关注评分差距大（多方远高于空方）的股票
         - 点击股票可展开查看详细分析
+        - 收盘后定时运行 `python scripts/refresh_top10.py`，打开页面即可直接看到当日推荐
         """)
 
 
@@ -4,11 +4,10 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 
-from data.fetcher import DataFetcher
 from signals.analyzer import StrategyAnalyzer, ActionType
-from database.models import Database
+from utils.singletons import get_db, get_fetcher, get_analyzer
 
 st.set_page_config(
     page_title="自选ETF - 反转三兄弟",
@@ -16,22 +15,26 @@ st.set_page_config(
     layout="wide"
 )
 
-# 初始化
-db = Database()
-analyzer = StrategyAnalyzer()
-fetcher = DataFetcher()
+# 初始化（跨重跑、跨页面共享）
+db = get_db()
+analyzer = get_analyzer()
+fetcher = get_fetcher()
 
 
-def render_action_badge(action: str):
-    """渲染操作建议标签"""
-    colors = {
-        "买入": ("🟢", "#e8f5e9", "#2e7d32"),
-        "加仓": ("🟢", "#e8f5e9", "#4caf50"),
-        "卖出": ("🔴", "#ffebee", "#c62828"),
-        "减仓": ("🟠", "#fff3e0", "#ef6c00"),
-        "持有观望": ("⚪", "#f5f5f5", "#616161"),
-    }
-    emoji, bg, color = colors.get(action, ("⚪", "#f5f5f5", "#616161"))
+# 操作类型 -> (图标, 背景色, 文字色)
+_BADGE_COLORS = {
+    "买入": ("🟢", "#e8f5e9", "#2e7d32"),
+    "加仓": ("🟢", "#e8f5e9", "#4caf50"),
+    "卖出": ("🔴", "#ffebee", "#c62828"),
+    "减仓": ("🟠", "#fff3e0", "#ef6c00"),
+    "持有观望": ("⚪", "#f5f5f5", "#616161"),
+}
+_DEFAULT_BADGE_COLORS = ("⚪", "#f5f5f5", "#616161")
+
+
+def _build_action_badge(action: str):
+    """生成操作建议标签HTML"""
+    emoji, bg, color = _BADGE_COLORS.get(action, _DEFAULT_BADGE_COLORS)
     return f"""<span style="
         display: inline-block;
         background: {bg};
@@ -43,6 +46,16 @@ def render_action_badge(action: str):
     ">{emoji} {action}</span>"""
 
 
+# 标签只有几种操作类型，导入时预先生成
+_BADGE_HTML = {action: _build_action_badge(action) for action in _BADGE_COLORS}
+
+
+def render_action_badge(action: str):
+    """渲染操作建议标签"""
+    html = _BADGE_HTML.get(action)
+    return html if html is not None else _build_action_badge(action)
+
+
 def render_etf_analysis(analysis):
     """渲染ETF详细分析"""
     col1, col2 = st.columns([1, 2])
@@ -84,6 +97,35 @@ def render_etf_analysis(analysis):
         st.markdown(f"**MACD**: {analysis.macd_cross if analysis.macd_cross != '无' else '无信号'}")
 
 
+# 自选ETF分析的总等待时间（秒），到时仍未完成的跳过
+ETF_ANALYZE_TIMEOUT = 30
+
+
+def _kline_snapshot_key(df: pd.DataFrame) -> tuple:
+    """K线只在末尾追加/更新，(行数, 最后日期, 最后收盘价, 最后成交量) 即可标识一份数据"""
+    last = df.iloc[-1]
+    return (len(df), str(last["date"]), float(last["close"]), float(last["volume"]))
+
+
+@st.cache_data(max_entries=500, show_spinner=False, hash_funcs={pd.DataFrame: _kline_snapshot_key})
+def _analyze_klines(df: pd.DataFrame, code: str, name: str):
+    """分析一份K线；同一份数据只分析一次，省去默认的整表哈希"""
+    return analyzer.analyze(df, code, name)
+
+
+def _cached_analyze(code: str, name: str, days: int):
+    """获取ETF K线（数据层缓存5分钟）并分析，K线没有变化时直接命中分析缓存"""
+    df = fetcher.get_etf_data(code, days=days)
+    if df is None or df.empty:
+        return None
+    return _analyze_klines(df, code, name)
+
+
+def _analyze_etf(etf):
+    """分析单只ETF，返回 (etf, analysis)，失败时analysis为None"""
+    return etf, _cached_analyze(etf["code"], etf["name"], StrategyAnalyzer.LOOKBACK_DAYS)
+
+
 def main():
     st.title("📊 自选ETF")
     st.caption("ETF监控与策略分析")
@@ -91,6 +133,9 @@ def main():
     # ============ Tab布局 ============
     tab1, tab2, tab3 = st.tabs(["📋 我的ETF", "🔍 搜索ETF", "🏆 热门ETF推荐"])
 
+    # 自选ETF代码集合，一次查询供各Tab判断是否已添加
+    watchlist_codes = db.get_etf_watchlist_codes()
+
     # ============ 我的ETF ============
     with tab1:
         # 获取自选ETF列表
@@ -98,7 +143,12 @@ def main():
 
         if not etf_watchlist:
             st.info("暂无自选ETF，请在「搜索ETF」或「热门ETF推荐」中添加")
+        elif not (st.session_state.get("etf_analyzed") or st.button("📈 分析自选ETF", type="primary")):
+            # 所有Tab每次重跑都会执行，分析要逐只拉K线，点击后才开始；之后本次会话内自动分析
+            st.write(f"共 {len(etf_watchlist)} 只ETF，点击上方按钮开始分析")
         else:
+            st.session_state["etf_analyzed"] = True
+
             col1, col2 = st.columns([1, 5])
             with col1:
                 if st.button("🔄 刷新分析"):
@@ -117,25 +167,40 @@ def main():
             }
 
             with st.spinner("正在分析自选ETF..."):
-                for etf in etf_watchlist:
-                    code = etf["code"]
-                    name = etf["name"]
-
-                    df = fetcher.get_etf_data(code, days=120)
-                    if df is None:
-                        continue
-
-                    analysis = analyzer.analyze(df, code, name)
+                # 网络请求并发进行，结果在主线程里分组（Streamlit组件不是线程安全的）。
+                # 不用 with：退出时会 shutdown(wait=True) 继续等卡住的请求；这里到总时限就不再等
+                ex = ThreadPoolExecutor(max_workers=8)
+                futures = {ex.submit(_analyze_etf, etf): i for i, etf in enumerate(etf_watchlist)}
+                finished = {}
+                try:
+                    for future in as_completed(futures, timeout=ETF_ANALYZE_TIMEOUT):
+                        try:
+                            finished[futures[future]] = future.result()
+                        except Exception:
+                            # 单只ETF出错不影响其他ETF
+                            continue
+                except FutureTimeoutError:
+                    pass
+                finally:
+                    ex.shutdown(wait=False, cancel_futures=True)
+
+                # 按自选顺序分组
+                for i in sorted(finished):
+                    etf, analysis = finished[i]
                     if analysis is None:
                         continue
 
                     analysis_results[analysis.action.value].append({
-                        "code": code,
-                        "name": name,
+                        "code": etf["code"],
+                        "name": etf["name"],
                         "analysis": analysis,
                         "price": analysis.current_price
                     })
 
+            skipped = len(etf_watchlist) - len(finished)
+            if skipped:
+                st.warning(f"{skipped} 只ETF分析超时或出错，已跳过")
+
             # 分类显示
             for action_type in ["买入", "加仓", "减仓", "卖出", "持有观望"]:
                 if analysis_results[action_type]:
@@ -169,7 +234,7 @@ def main():
                 for etf in results[:10]:
                     code = etf["code"]
                     name = etf["name"]
-                    in_watchlist = db.is_in_etf_watchlist(code)
+                    in_watchlist = code in watchlist_codes
 
                     cols = st.columns([2, 3, 2])
                     cols[0].write(code)
@@ -191,6 +256,10 @@ def main():
 
         popular_etfs = fetcher.get_popular_etfs()
 
+        # 行情按需获取：打开开关后一次请求拿到全部热门ETF行情（缓存1分钟）
+        show_quotes = st.toggle("显示实时涨跌幅", key="etf_show_quotes")
+        quotes = fetcher.get_batch_quotes([etf["code"] for etf in popular_etfs]) if show_quotes else {}
+
         # 按类别分组显示
         categories = {}
         for etf in popular_etfs:
@@ -205,20 +274,19 @@ def main():
             for etf in etfs:
                 code = etf["code"]
                 name = etf["name"]
-                in_watchlist = db.is_in_etf_watchlist(code)
+                in_watchlist = code in watchlist_codes
 
                 cols = st.columns([2, 3, 2, 2])
                 cols[0].write(code)
                 cols[1].write(name)
 
-                # 获取实时行情
-                try:
-                    quote = fetcher.get_realtime_quote(code)
-                    if quote:
-                        pct = quote.get("pct_change", 0)
-                        color = "red" if pct > 0 else ("green" if pct < 0 else "gray")
-                        cols[2].markdown(f"<span style='color:{color}'>{pct:+.2f}%</span>", unsafe_allow_html=True)
-                except:
+                # 实时行情
+                quote = quotes.get(code)
+                if quote:
+                    pct = quote.get("pct_change", 0)
+                    color = "red" if pct > 0 else ("green" if pct < 0 else "gray")
+                    cols[2].markdown(f"<span style='color:{color}'>{pct:+.2f}%</span>", unsafe_allow_html=True)
+                else:
                     cols[2].write("--")
 
                 if in_watchlist:
@@ -233,11 +301,9 @@ def main():
 
         # 一键添加全部
         if st.button("📥 一键添加全部热门ETF"):
-            added = 0
-            for etf in popular_etfs:
-                if not db.is_in_etf_watchlist(etf["code"]):
-                    db.add_to_etf_watchlist(etf["code"], etf["name"])
-                    added += 1
+            added = db.add_many_to_etf_watchlist(
+                [etf for etf in popular_etfs if etf["code"] not in watchlist_codes]
+            )
             st.success(f"已添加 {added} 只ETF")
             st.rerun()
 
@@ -247,47 +313,41 @@ def main():
         st.subheader("ETF买入信号扫描")
 
         if st.button("🔍 扫描热门ETF买入信号"):
-            with st.spinner("正在扫描..."):
-                buy_signals = []
+            progress = st.progress(0)
+            summary = st.empty()
+            results = st.container()
+            found = 0
 
-                progress = st.progress(0)
-                for i, etf in enumerate(popular_etfs):
-                    code = etf["code"]
-                    name = etf["name"]
+            # 并发获取和分析，每完成一只就渲染，不必等全部扫描结束
+            with ThreadPoolExecutor(max_workers=8) as ex:
+                futures = [ex.submit(_analyze_etf, etf) for etf in popular_etfs]
 
+                for i, future in enumerate(as_completed(futures)):
                     try:
-                        df = fetcher.get_etf_data(code, days=60)
-                        if df is not None:
-                            analysis = analyzer.analyze(df, code, name)
-                            if analysis and analysis.action in (ActionType.BUY, ActionType.ADD):
-                                buy_signals.append({
-                                    "code": code,
-                                    "name": name,
-                                    "category": etf.get("category", ""),
-                                    "analysis": analysis
-                                })
-                    except:
-                        pass
+                        etf, analysis = future.result()
+                    except Exception:
+                        analysis = None
 
-                    progress.progress((i + 1) / len(popular_etfs))
-                    time.sleep(0.1)
+                    if analysis and analysis.action in (ActionType.BUY, ActionType.ADD):
+                        found += 1
+                        summary.success(f"已发现 {found} 只ETF有买入信号，继续扫描中...")
+
+                        with results.expander(f"🟢 **{etf['code']}** {etf['name']} ({etf.get('category', '')}) - {analysis.action_reason}", expanded=True):
+                            render_etf_analysis(analysis)
 
-                progress.empty()
+                            if etf['code'] not in watchlist_codes:
+                                if st.button("➕ 加自选", key=f"scan_add_{etf['code']}"):
+                                    db.add_to_etf_watchlist(etf['code'], etf['name'])
+                                    st.success(f"已添加 {etf['name']}")
 
-            if buy_signals:
-                st.success(f"发现 {len(buy_signals)} 只ETF有买入信号")
+                    progress.progress((i + 1) / len(popular_etfs))
 
-                for sig in buy_signals:
-                    with st.expander(f"🟢 **{sig['code']}** {sig['name']} ({sig['category']}) - {sig['analysis'].action_reason}", expanded=True):
-                        render_etf_analysis(sig['analysis'])
+            progress.empty()
 
-                        if not db.is_in_etf_watchlist(sig['code']):
-                            if st.button("➕ 加自选", key=f"scan_add_{sig['code']}"):
-                                db.add_to_etf_watchlist(sig['code'], sig['name'])
-                                st.success(f"已添加 {sig['name']}")
+            if found:
+                summary.success(f"发现 {found} 只ETF有买入信号")
             else:
-                st.info("热门ETF暂无明显买入信号")
-
+                summary.info("热门ETF暂无明显买入信号")
 
 if __name__ == "__main__":
     main()
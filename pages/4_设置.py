@@ -2,9 +2,9 @@
 设置页面
 """
 import streamlit as st
+import pandas as pd
 
-from database.models import Database
-from notify.wechat import WeChatNotifier
+from utils.singletons import get_db, get_notifier
 
 st.set_page_config(
     page_title="设置 - 反转三兄弟",
@@ -12,14 +12,27 @@ st.set_page_config(
     layout="wide"
 )
 
-# 初始化
-db = Database()
-notifier = WeChatNotifier()
+# 初始化（跨重跑、跨页面共享）
+db = get_db()
+notifier = get_notifier()
+
+
+# 本页用到的配置项，每次重跑一次查询读出
+SETTING_KEYS = [
+    "serverchan_key",
+    "push_time",
+    "volume_threshold",
+    "hammer_ratio",
+    "engulfing_volume",
+    "doji_ratio",
+]
 
 
 def main():
     st.title("⚙️ 设置")
 
+    cfg = db.get_settings_dict(SETTING_KEYS)
+
     # ============ 微信推送设置 ============
     st.subheader("📱 微信推送设置")
 
@@ -30,7 +43,7 @@ def main():
     3. 将 SendKey 填入下方
     """)
 
-    current_key = db.get_setting("serverchan_key", "")
+    current_key = cfg.get("serverchan_key", "")
 
     # 显示当前状态
     if current_key:
@@ -81,7 +94,7 @@ def main():
 
     st.info("自动推送功能需要配合定时任务使用（如 cron）。这里设置的时间仅作为提醒。")
 
-    current_push_time = db.get_setting("push_time", "15:30")
+    current_push_time = cfg.get("push_time", "15:30")
 
     push_time = st.time_input(
         "每日推送时间",
@@ -108,7 +121,7 @@ def main():
             "放量阈值",
             min_value=1.0,
             max_value=3.0,
-            value=float(db.get_setting("volume_threshold", "1.5")),
+            value=float(cfg.get("volume_threshold", "1.5")),
             step=0.1,
             help="成交量超过均量的倍数才算放量"
         )
@@ -117,7 +130,7 @@ def main():
             "锤子线影线比例",
             min_value=1.5,
             max_value=3.0,
-            value=float(db.get_setting("hammer_ratio", "2.0")),
+            value=float(cfg.get("hammer_ratio", "2.0")),
             step=0.1,
             help="下影线长度/实体长度的最小比例"
         )
@@ -127,7 +140,7 @@ def main():
             "吞没形态放量要求",
             min_value=1.0,
             max_value=2.0,
-            value=float(db.get_setting("engulfing_volume", "1.2")),
+            value=float(cfg.get("engulfing_volume", "1.2")),
             step=0.1,
             help="吞没形态时成交量的放大倍数要求"
         )
@@ -136,7 +149,7 @@ def main():
             "十字星实体比例",
             min_value=0.05,
             max_value=0.2,
-            value=float(db.get_setting("doji_ratio", "0.1")),
+            value=float(cfg.get("doji_ratio", "0.1")),
             step=0.01,
             help="实体占振幅比例小于此值算十字星"
         )
@@ -203,17 +216,9 @@ def main():
 
 
 def export_watchlist() -> str:
-    """导出自选股为CSV"""
+    """导出自选股为CSV（pandas负责引号转义，名称含逗号也不会错列）"""
     watchlist = db.get_watchlist()
-
-    if not watchlist:
-        return "code,name,added_at\n"
-
-    lines = ["code,name,added_at"]
-    for stock in watchlist:
-        lines.append(f"{stock['code']},{stock['name']},{stock['added_at']}")
-
-    return "\n".join(lines)
+    return pd.DataFrame(watchlist, columns=["code", "name", "added_at"]).to_csv(index=False)
 
 
 if __name__ == "__main__":
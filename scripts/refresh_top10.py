@@ -0,0 +1,60 @@
+"""
+后台刷新Top10推荐 - 扫描市场并写入数据库，页面直接读取结果
+同时预先分析自选股，自选股页面打开时直接读取当日分析结果
+
+用法（建议收盘后定时执行，如 cron: 30 15 * * 1-5）:
+    python scripts/refresh_top10.py
+"""
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data.fetcher import DataFetcher
+from database.models import Database
+from signals.analyzer import StrategyAnalyzer
+from signals.scanner import scan_market
+
+
+def warm_watchlist(db: Database, fetcher: DataFetcher, trade_date: str) -> int:
+    """分析全部自选股并保存结果，返回成功数"""
+    analyzer = StrategyAnalyzer()
+    saved = 0
+    for stock in db.get_watchlist():
+        df = fetcher.get_stock_data(stock["code"], days=StrategyAnalyzer.LOOKBACK_DAYS)
+        if df is None:
+            continue
+        analysis = analyzer.analyze(df, stock["code"], stock["name"])
+        if analysis and db.save_analysis(stock["code"], trade_date, analysis.to_dict()):
+            saved += 1
+    return saved
+
+
+def main():
+    scan_date = datetime.now().strftime("%Y-%m-%d")
+    db = Database()
+    fetcher = DataFetcher()
+
+    print(f"[{datetime.now():%H:%M:%S}] 已预先分析 {warm_watchlist(db, fetcher, scan_date)} 只自选股")
+    print(f"[{datetime.now():%H:%M:%S}] 开始扫描市场...")
+
+    # 后台任务不受界面限制，K线分析用多进程跑满CPU
+    top10 = scan_market(fetcher, processes=os.cpu_count() or 1)
+    if not top10:
+        print("未找到符合条件的股票")
+        return 1
+
+    rows = [{**item, "analysis": item["analysis"].to_dict()} for item in top10]
+    if not db.save_top10(scan_date, rows):
+        return 1
+
+    print(f"[{datetime.now():%H:%M:%S}] 已保存 {len(rows)} 只推荐股票 ({scan_date})")
+    for rank, item in enumerate(top10, 1):
+        print(f"  #{rank} {item['code']} {item['name']} 评分 {item['score']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+形态判断的数值内核 - 只做标量比较，安装了numba时JIT编译（nogil，可在多线程扫描中并行）
+
+每个函数返回 (是否匹配, 强度)，PatternResult 由 PatternRecognizer 组装。
+"""
+from typing import Tuple
+
+from utils._numba import njit
+
+
+@njit(cache=True, nogil=True)
+def bullish_engulfing(prev_open: float, prev_close: float, curr_open: float, curr_close: float,
+                      volume_ratio: float, volume_threshold: float) -> Tuple[bool, float]:
+    """阳吞阴：前阴后阳，阳线实体包住阴线实体；放量时强度提高"""
+    if not (prev_close < prev_open and curr_close > curr_open):
+        return False, 0.0
+    if curr_open < prev_close and curr_close > prev_open:
+        return True, 0.9 if volume_ratio > volume_threshold else 0.7
+    return False, 0.0
+
+
+@njit(cache=True, nogil=True)
+def bearish_engulfing(prev_open: float, prev_close: float, curr_open: float, curr_close: float,
+                      volume_ratio: float, volume_threshold: float) -> Tuple[bool, float]:
+    """阴吞阳：前阳后阴，阴线实体包住阳线实体；放量时强度提高"""
+    if not (prev_close > prev_open and curr_close < curr_open):
+        return False, 0.0
+    if curr_open > prev_close and curr_close < prev_open:
+        return True, 0.9 if volume_ratio > volume_threshold else 0.7
+    return False, 0.0
+
+
+@njit(cache=True, nogil=True)
+def morning_star(day1_open: float, day1_close: float, day2_open: float, day2_close: float,
+                 day3_open: float, day3_close: float) -> Tuple[bool, float]:
+    """启明星：大阴线 + 小实体 + 大阳线收进第一天实体中部以上"""
+    if not day1_close < day1_open:
+        return False, 0.0
+    body1 = abs(day1_close - day1_open)
+    if abs(day2_close - day2_open) > body1 * 0.5:
+        return False, 0.0
+    if not day3_close > day3_open:
+        return False, 0.0
+    if abs(day3_close - day3_open) < body1 * 0.5:
+        return False, 0.0
+    if day3_close > (day1_open + day1_close) / 2:
+        return True, 0.85
+    return False, 0.0
+
+
+@njit(cache=True, nogil=True)
+def evening_star(day1_open: float, day1_close: float, day2_open: float, day2_close: float,
+                 day3_open: float, day3_close: float) -> Tuple[bool, float]:
+    """黄昏星：大阳线 + 小实体 + 大阴线收进第一天实体中部以下"""
+    if not day1_close > day1_open:
+        return False, 0.0
+    body1 = abs(day1_close - day1_open)
+    if abs(day2_close - day2_open) > body1 * 0.5:
+        return False, 0.0
+    if not day3_close < day3_open:
+        return False, 0.0
+    if abs(day3_close - day3_open) < body1 * 0.5:
+        return False, 0.0
+    if day3_close < (day1_open + day1_close) / 2:
+        return True, 0.85
+    return False, 0.0
+
+
+# 导入时先编译一次，避免首个请求承担JIT延迟
+bullish_engulfing(1.0, 0.0, 0.0, 1.0, 1.0, 1.0)
+bearish_engulfing(0.0, 1.0, 1.0, 0.0, 1.0, 1.0)
+morning_star(1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+evening_star(0.0, 1.0, 1.0, 1.0, 1.0, 0.0)
@@ -2,12 +2,13 @@
 反转三兄弟策略分析器
 基于PPT中的策略要点进行分析
 """
+import numpy as np
 import pandas as pd
 from dataclasses import dataclass
 from typing import Optional, List, Dict
 from enum import Enum
 
-from utils.indicators import calculate_macd, calculate_ma, check_macd_cross
+from utils.indicators import calculate_ma, calculate_macd
 
 
 class ActionType(Enum):
@@ -72,6 +73,8 @@ class StrategyAnalysis:
     bearish_factors: List[str]  # 看空因素
     risk_level: str  # 高/中/低
     position_advice: str  # 仓位建议（如加仓10%、减仓30%等）
+    bullish_score: int = 0  # 多方得分（强信号3分，中信号1分）
+    bearish_score: int = 0  # 空方得分
 
     def to_dict(self) -> dict:
         return {
@@ -80,6 +83,8 @@ class StrategyAnalysis:
             "current_price": self.current_price,
             "volume_status": self.volume_status,
             "volume_ratio": self.volume_ratio,
+            "price_new_high": self.price_new_high,
+            "price_new_low": self.price_new_low,
             "volume_price_conclusion": self.volume_price_conclusion,
             "support_lines": self.support_lines,
             "resistance_lines": self.resistance_lines,
@@ -105,13 +110,39 @@ class StrategyAnalysis:
             "bullish_factors": self.bullish_factors,
             "bearish_factors": self.bearish_factors,
             "risk_level": self.risk_level,
-            "position_advice": self.position_advice
+            "position_advice": self.position_advice,
+            "bullish_score": self.bullish_score,
+            "bearish_score": self.bearish_score
         }
 
+    @classmethod
+    def from_dict(cls, d: dict) -> "StrategyAnalysis":
+        """由 to_dict() 的结果还原"""
+        d = dict(d)
+        d["action"] = ActionType(d["action"])
+        d.setdefault("price_new_high", False)
+        d.setdefault("price_new_low", False)
+        return cls(**d)
+
+
+def _score_factors(factors: List[str]) -> int:
+    """因素评分：【强】3分，【中】1分，单次遍历"""
+    score = 0
+    for f in factors:
+        if "【强】" in f:
+            score += 3
+        elif "【中】" in f:
+            score += 1
+    return score
+
 
 class StrategyAnalyzer:
     """反转三兄弟策略分析器"""
 
+    # 分析所需的K线根数：最长回看为89日均线，另留约10根给MACD预热；
+    # 支撑压力线只看最近60根。不足时89日均线不参与判断，少于30根不分析
+    LOOKBACK_DAYS = 100
+
     def __init__(self):
         # 均线周期 (按用户要求: 7, 18, 30, 89)
         self.ma_periods = [7, 18, 30, 89]
@@ -161,7 +192,8 @@ class StrategyAnalyzer:
         patterns, pattern_analysis = self._detect_patterns_enhanced(df, volume_ratio, trend_5d, trend_10d)
 
         # 8. 综合判断（详细版）
-        action, action_reason, action_detail, bullish_factors, bearish_factors, risk_level, position_advice = \
+        (action, action_reason, action_detail, bullish_factors, bearish_factors,
+         risk_level, position_advice, bullish_score, bearish_score) = \
             self._generate_detailed_recommendation(
                 volume_status, volume_ratio, price_new_high, price_new_low,
                 near_support, near_resistance, upper_shadow_warning, upper_shadow_ratio,
@@ -203,7 +235,9 @@ class StrategyAnalyzer:
             bullish_factors=bullish_factors,
             bearish_factors=bearish_factors,
             risk_level=risk_level,
-            position_advice=position_advice
+            position_advice=position_advice,
+            bullish_score=bullish_score,
+            bearish_score=bearish_score
         )
 
     def _analyze_volume(self, df: pd.DataFrame) -> tuple:
@@ -211,8 +245,9 @@ class StrategyAnalyzer:
         if len(df) < 6:
             return "平量", 1.0
 
-        current_vol = df["volume"].iloc[-1]
-        ma5_vol = df["volume"].tail(6).head(5).mean()
+        volume = df["volume"].to_numpy(dtype=np.float64)
+        current_vol = volume[-1]
+        ma5_vol = volume[-6:-1].mean()
 
         if ma5_vol == 0:
             return "平量", 1.0
@@ -230,15 +265,15 @@ class StrategyAnalyzer:
         """是否创近期新高"""
         if len(df) < period:
             return False
-        recent_high = df["high"].tail(period).max()
-        return df["high"].iloc[-1] >= recent_high * 0.99
+        high = df["high"].to_numpy(dtype=np.float64)
+        return high[-1] >= high[-period:].max() * 0.99
 
     def _is_new_low(self, df: pd.DataFrame, period: int) -> bool:
         """是否创近期新低"""
         if len(df) < period:
             return False
-        recent_low = df["low"].tail(period).min()
-        return df["low"].iloc[-1] <= recent_low * 1.01
+        low = df["low"].to_numpy(dtype=np.float64)
+        return low[-1] <= low[-period:].min() * 1.01
 
     def _get_volume_price_conclusion(self, volume_status: str,
                                       new_high: bool, new_low: bool) -> str:
@@ -548,13 +583,22 @@ class StrategyAnalyzer:
         else:
             return "均线缠绕，方向不明"
 
+    def _macd_last_two(self, df: pd.DataFrame) -> tuple:
+        """
+        计算最近两根K线的 (DIF, DEA)
+
+        每次对传入的整段K线重算：EMA的结果取决于序列起点，分析窗口滚动或前复权数据整体重算后
+        沿用旧状态递推会和整段计算对不上；calculate_macd 一次遍历的内核已足够快
+
+        Returns:
+            ((昨日DIF, 昨日DEA), (今日DIF, 今日DEA))
+        """
+        dif, dea, _ = calculate_macd(df["close"])
+        return (dif.iloc[-2], dea.iloc[-2]), (dif.iloc[-1], dea.iloc[-1])
+
     def _analyze_macd(self, df: pd.DataFrame) -> tuple:
         """MACD分析"""
-        dif, dea, macd = calculate_macd(df["close"])
-
-        current_dif = dif.iloc[-1]
-        current_dea = dea.iloc[-1]
-        current_macd = macd.iloc[-1]
+        (prev_dif, prev_dea), (current_dif, current_dea) = self._macd_last_two(df)
 
         # MACD状态
         if current_dif > 0 and current_dea > 0:
@@ -564,8 +608,9 @@ class StrategyAnalyzer:
         else:
             status = "零轴附近，转折期"
 
-        # 金叉死叉
-        is_golden, is_death = check_macd_cross(dif, dea)
+        # 金叉死叉: 今日DIF在DEA上方、昨日在下方为金叉，反之为死叉
+        is_golden = (current_dif > current_dea) and (prev_dif <= prev_dea)
+        is_death = (current_dif < current_dea) and (prev_dif >= prev_dea)
         if is_golden:
             cross = "金叉"
         elif is_death:
@@ -987,10 +1032,8 @@ class StrategyAnalyzer:
             bearish_factors.append(f"【中】近20日趋势走弱")
 
         # === 综合评分 ===
-        bullish_score = len([f for f in bullish_factors if "【强】" in f]) * 3 + \
-                        len([f for f in bullish_factors if "【中】" in f]) * 1
-        bearish_score = len([f for f in bearish_factors if "【强】" in f]) * 3 + \
-                        len([f for f in bearish_factors if "【中】" in f]) * 1
+        bullish_score = _score_factors(bullish_factors)
+        bearish_score = _score_factors(bearish_factors)
 
         score = bullish_score - bearish_score
 
@@ -1042,7 +1085,8 @@ class StrategyAnalyzer:
 
         action_detail = "；".join(detail_parts)
 
-        return action, reason, action_detail, bullish_factors, bearish_factors, risk, position_advice
+        return (action, reason, action_detail, bullish_factors, bearish_factors, risk, position_advice,
+                bullish_score, bearish_score)
 
     def has_buy_signal(self, df: pd.DataFrame, code: str, name: str) -> tuple:
         """
@@ -1,20 +1,31 @@
 """
 信号检测引擎 - 整合形态和技术指标
 """
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
-from .patterns import PatternRecognizer, PatternResult, SignalType
+from .patterns import PatternRecognizer, PatternResult, SignalType, TrendCache
 from utils.indicators import (
     calculate_macd,
     calculate_volume_ratio,
-    check_macd_cross,
-    calculate_ma
+    check_macd_cross
 )
 from config import SIGNAL_CONFIG
 
+# 检测参数导入时读一次，避免每次检测都查字典
+_MACD_FAST = int(SIGNAL_CONFIG["macd_fast"])
+_MACD_SLOW = int(SIGNAL_CONFIG["macd_slow"])
+_MACD_SIGNAL = int(SIGNAL_CONFIG["macd_signal"])
+_HAMMER_SHADOW_RATIO = float(SIGNAL_CONFIG["hammer_shadow_ratio"])
+_DOJI_BODY_RATIO = float(SIGNAL_CONFIG["doji_body_ratio"])
+_ENGULFING_VOLUME_RATIO = float(SIGNAL_CONFIG["engulfing_volume_ratio"])
+
 
 @dataclass
 class Signal:
@@ -46,12 +57,21 @@ class Signal:
 class SignalDetector:
     """信号检测器"""
 
+    # 检测结果LRU缓存容量（按股票+K线内容缓存）
+    CACHE_SIZE = 512
+
+    # 参与检测的K线列，缓存键对这些列的内容取摘要
+    _KEY_COLUMNS = ("open", "high", "low", "close", "volume")
+
     def __init__(self):
         self.pattern_recognizer = PatternRecognizer(
-            hammer_shadow_ratio=SIGNAL_CONFIG["hammer_shadow_ratio"],
-            doji_body_ratio=SIGNAL_CONFIG["doji_body_ratio"],
-            engulfing_volume_ratio=SIGNAL_CONFIG["engulfing_volume_ratio"]
+            hammer_shadow_ratio=_HAMMER_SHADOW_RATIO,
+            doji_body_ratio=_DOJI_BODY_RATIO,
+            engulfing_volume_ratio=_ENGULFING_VOLUME_RATIO
         )
+        # DataFrame 不可哈希，无法直接用 functools.lru_cache，这里手动维护LRU
+        self._cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
 
     def detect_signals(
         self,
@@ -70,95 +90,163 @@ class SignalDetector:
         Returns:
             检测到的信号列表
         """
+        return self._to_signals(self.detect_signal_table(df, code, name))
+
+    def detect_signal_table(
+        self,
+        df: pd.DataFrame,
+        code: str,
+        name: str
+    ) -> Optional[Dict]:
+        """
+        检测股票的所有信号，按列返回（结构数组：每个字段一个列表）
+
+        批量扫描只需比较强度时不必为每个信号构造 Signal 对象，
+        需要展示时再用 detect_signals 转换。
+
+        同一只股票K线没有变化（如重复扫描）时直接返回缓存结果，
+        新K线到来后摘要变化，缓存自然失效。返回值与缓存共享，调用方不要修改。
+
+        Returns:
+            {"code", "name", "price": 标量,
+             "signal_type", "pattern_name", "description", "confirmations": 列表,
+             "strength": np.ndarray}；数据不足时返回None
+        """
         if df is None or len(df) < 10:
+            return None
+
+        digest = hashlib.blake2b(digest_size=8)
+        for col in self._KEY_COLUMNS:
+            digest.update(np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).tobytes())
+        key = (code, name, len(df), digest.digest())
+
+        with self._cache_lock:
+            table = self._cache.get(key)
+            if table is not None:
+                self._cache.move_to_end(key)
+                return table
+
+        table = self._detect_signals(df, code, name)
+
+        with self._cache_lock:
+            self._cache[key] = table
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        return table
+
+    @staticmethod
+    def _to_signals(table: Optional[Dict], index: Optional[int] = None) -> List[Signal]:
+        """把按列存放的检测结果转换为 Signal 列表（index 指定时只转换这一条）"""
+        if table is None:
             return []
 
-        signals = []
+        rows = range(len(table["strength"])) if index is None else (index,)
+        return [
+            Signal(
+                code=table["code"],
+                name=table["name"],
+                signal_type=table["signal_type"][i],
+                pattern_name=table["pattern_name"][i],
+                strength=float(table["strength"][i]),
+                price=table["price"],
+                description=table["description"][i],
+                confirmations=list(table["confirmations"][i])
+            )
+            for i in rows
+        ]
+
+    def _detect_signals(
+        self,
+        df: pd.DataFrame,
+        code: str,
+        name: str
+    ) -> Dict:
+        """检测股票的所有信号（无缓存），按列返回"""
+        signal_types = []
+        pattern_names = []
+        strengths = []
+        descriptions = []
+        confirmations_list = []
+
+        # 指标在NumPy数组上计算，避免每个指标都构造一次 Series
+        close = df["close"].to_numpy(dtype=np.float64)
+        volume = df["volume"].to_numpy(dtype=np.float64)
 
         # 计算技术指标
-        dif, dea, macd_hist = calculate_macd(
-            df["close"],
-            SIGNAL_CONFIG["macd_fast"],
-            SIGNAL_CONFIG["macd_slow"],
-            SIGNAL_CONFIG["macd_signal"]
-        )
+        dif, dea, macd_hist = calculate_macd(close, _MACD_FAST, _MACD_SLOW, _MACD_SIGNAL)
 
-        volume_ratio = calculate_volume_ratio(df["volume"]).iloc[-1] if len(df) > 5 else 1.0
+        volume_ratio = calculate_volume_ratio(volume)[-1] if len(df) > 5 else 1.0
 
         # 检查MACD金叉/死叉
         is_golden_cross, is_death_cross = check_macd_cross(dif, dea)
 
-        # 判断趋势
-        trend = self.pattern_recognizer.detect_trend(df)
+        # 判断趋势；趋势和均线经缓存计算，形态检测时直接复用
+        cache = TrendCache(self.pattern_recognizer)
+        trend = cache.trend(df)
 
         # 当前价格
-        current_price = df["close"].iloc[-1]
-
-        # 检测各种形态
-        patterns_to_check = [
-            ("bullish_engulfing", self.pattern_recognizer.check_bullish_engulfing(df, volume_ratio)),
-            ("bearish_engulfing", self.pattern_recognizer.check_bearish_engulfing(df, volume_ratio)),
-            ("dark_cloud", self.pattern_recognizer.check_dark_cloud_cover(df)),
-            ("piercing", self.pattern_recognizer.check_piercing_line(df)),
-            ("hammer", self.pattern_recognizer.check_hammer(df, trend)),
-            ("hanging_man", self.pattern_recognizer.check_hanging_man(df, trend)),
-            ("doji", self.pattern_recognizer.check_doji(df)),
-            ("morning_star", self.pattern_recognizer.check_morning_star(df)),
-            ("evening_star", self.pattern_recognizer.check_evening_star(df)),
-        ]
+        current_price = close[-1]
+
+        # MA20 与形态无关，循环外只算一次
+        ma20 = cache.ma(df, 20)
+        ma20_value = ma20[-1] if len(ma20) > 0 and not np.isnan(ma20[-1]) else None
+        price_to_ma = (current_price - ma20_value) / ma20_value if ma20_value else None
+        near_ma20 = price_to_ma is not None and -0.02 < price_to_ma < 0.02
+
+        # 检测各种形态：按需逐个产出，尽早跳过无效结果
+        patterns = self.pattern_recognizer.detect_all_patterns(df, volume_ratio, cache)
+
+        for pattern_id, result in patterns:
+            # 跳过无形态（强度为0）和中性信号（如普通十字星）
+            if result.strength <= 0 or result.signal_type == SignalType.NEUTRAL:
+                continue
+
+            confirmations = []
+            adjusted_strength = result.strength
+
+            # 添加MACD确认
+            if result.signal_type == SignalType.BULLISH and is_golden_cross:
+                confirmations.append("MACD金叉")
+                adjusted_strength = min(adjusted_strength + 0.1, 1.0)
+            elif result.signal_type == SignalType.BEARISH and is_death_cross:
+                confirmations.append("MACD死叉")
+                adjusted_strength = min(adjusted_strength + 0.1, 1.0)
+
+            # 添加成交量确认
+            if volume_ratio > 1.5:
+                confirmations.append(f"放量{volume_ratio:.1f}倍")
+                adjusted_strength = min(adjusted_strength + 0.05, 1.0)
+
+            # 添加趋势确认
+            if result.signal_type == SignalType.BULLISH and trend == "down":
+                confirmations.append("下跌趋势底部")
+            elif result.signal_type == SignalType.BEARISH and trend == "up":
+                confirmations.append("上涨趋势顶部")
+
+            # 检查均线支撑/压力
+            if near_ma20:
+                if result.signal_type == SignalType.BULLISH:
+                    confirmations.append("接近MA20支撑")
+                elif result.signal_type == SignalType.BEARISH:
+                    confirmations.append("接近MA20压力")
+
+            signal_types.append(result.signal_type)
+            pattern_names.append(result.name)
+            strengths.append(adjusted_strength)
+            descriptions.append(result.description)
+            confirmations_list.append(confirmations)
 
-        for pattern_id, result in patterns_to_check:
-            if result is not None:
-                # 跳过中性信号（如普通十字星）
-                if result.signal_type == SignalType.NEUTRAL:
-                    continue
-
-                confirmations = []
-                adjusted_strength = result.strength
-
-                # 添加MACD确认
-                if result.signal_type == SignalType.BULLISH and is_golden_cross:
-                    confirmations.append("MACD金叉")
-                    adjusted_strength = min(adjusted_strength + 0.1, 1.0)
-                elif result.signal_type == SignalType.BEARISH and is_death_cross:
-                    confirmations.append("MACD死叉")
-                    adjusted_strength = min(adjusted_strength + 0.1, 1.0)
-
-                # 添加成交量确认
-                if volume_ratio > 1.5:
-                    confirmations.append(f"放量{volume_ratio:.1f}倍")
-                    adjusted_strength = min(adjusted_strength + 0.05, 1.0)
-
-                # 添加趋势确认
-                if result.signal_type == SignalType.BULLISH and trend == "down":
-                    confirmations.append("下跌趋势底部")
-                elif result.signal_type == SignalType.BEARISH and trend == "up":
-                    confirmations.append("上涨趋势顶部")
-
-                # 检查均线支撑/压力
-                ma20 = calculate_ma(df["close"], 20)
-                if len(ma20) > 0 and not pd.isna(ma20.iloc[-1]):
-                    ma20_value = ma20.iloc[-1]
-                    price_to_ma = (current_price - ma20_value) / ma20_value
-
-                    if result.signal_type == SignalType.BULLISH and -0.02 < price_to_ma < 0.02:
-                        confirmations.append("接近MA20支撑")
-                    elif result.signal_type == SignalType.BEARISH and -0.02 < price_to_ma < 0.02:
-                        confirmations.append("接近MA20压力")
-
-                signal = Signal(
-                    code=code,
-                    name=name,
-                    signal_type=result.signal_type,
-                    pattern_name=result.name,
-                    strength=adjusted_strength,
-                    price=current_price,
-                    description=result.description,
-                    confirmations=confirmations
-                )
-                signals.append(signal)
-
-        return signals
+        return {
+            "code": code,
+            "name": name,
+            "price": current_price,
+            "signal_type": signal_types,
+            "pattern_name": pattern_names,
+            "strength": np.array(strengths, dtype=np.float64),
+            "description": descriptions,
+            "confirmations": confirmations_list,
+        }
 
     def detect_latest_signal(
         self,
@@ -172,14 +260,13 @@ class SignalDetector:
         Returns:
             最强的信号，如果没有则返回None
         """
-        signals = self.detect_signals(df, code, name)
+        table = self.detect_signal_table(df, code, name)
 
-        if not signals:
+        if table is None or len(table["strength"]) == 0:
             return None
 
-        # 按信号强度排序，返回最强的
-        signals.sort(key=lambda s: s.strength, reverse=True)
-        return signals[0]
+        # 只取强度最大的一条（同强度取先检测到的），不必整体排序
+        return self._to_signals(table, int(np.argmax(table["strength"])))[0]
 
     def get_signal_summary(self, signal: Signal) -> str:
         """
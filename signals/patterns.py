@@ -1,11 +1,15 @@
 """
 K线形态识别模块 - 反转三兄弟核心形态
 """
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple, Union
 from enum import Enum
 
+from . import _patterns_jit
+from utils.indicators import calculate_ma_np, calculate_volume_ratio
+
 
 class SignalType(Enum):
     """信号类型"""
@@ -14,15 +18,76 @@ class SignalType(Enum):
     NEUTRAL = "观望"
 
 
-@dataclass
+@dataclass(frozen=True)
 class PatternResult:
-    """形态识别结果"""
+    """形态识别结果（不可变，固定强度的结果用下面的模块级常量共享）"""
     name: str  # 形态名称
     signal_type: SignalType  # 信号类型
     strength: float  # 信号强度 0-1
     description: str  # 描述
 
 
+# 强度固定的形态每次命中都返回同一个实例，不再逐根K线新建对象；
+# 乌云盖顶、刺透形态的强度随插入深度变化，用 replace() 改写强度
+_BULLISH_ENGULFING_STRONG = PatternResult("阳吞阴", SignalType.BULLISH, 0.9, "阳线实体完全包含前一根阴线，看涨信号")
+_BULLISH_ENGULFING_WEAK = replace(_BULLISH_ENGULFING_STRONG, strength=0.7)
+_BEARISH_ENGULFING_STRONG = PatternResult("阴吞阳", SignalType.BEARISH, 0.9, "阴线实体完全包含前一根阳线，看跌信号")
+_BEARISH_ENGULFING_WEAK = replace(_BEARISH_ENGULFING_STRONG, strength=0.7)
+_DARK_CLOUD = PatternResult("乌云盖顶", SignalType.BEARISH, 0.9, "跳空高开后阴线深入前阳线实体，强烈看跌信号")
+_PIERCING = PatternResult("刺透形态", SignalType.BULLISH, 0.9, "跳空低开后阳线穿透前阴线实体，看涨信号")
+_HAMMER = PatternResult("锤子线", SignalType.BULLISH, 0.7, "底部出现锤子线，可能反转向上")
+_HANGING_MAN = PatternResult("上吊线", SignalType.BEARISH, 0.7, "顶部出现上吊线，可能反转向下")
+_DOJI = PatternResult("十字星", SignalType.NEUTRAL, 0.5, "十字星出现，市场犹豫不决，需结合位置判断")
+_MORNING_STAR = PatternResult("启明星", SignalType.BULLISH, 0.85, "底部启明星形态，强烈看涨信号")
+_EVENING_STAR = PatternResult("黄昏星", SignalType.BEARISH, 0.85, "顶部黄昏星形态，强烈看跌信号")
+
+# 不构成形态时 check_* 返回这个强度为0的结果而不是None，调用方统一按 strength > 0 过滤
+NO_MATCH = PatternResult("", SignalType.NEUTRAL, 0.0, "")
+
+
+class Bars(NamedTuple):
+    """
+    K线的OHLC数组（按列存放的连续 float64 数组），形态判断直接读数组，避免反复走 DataFrame 索引
+
+    注意 len(bars) 是字段数4，K线根数用 bars.n
+    """
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+
+    @property
+    def n(self) -> int:
+        """K线根数"""
+        return len(self.close)
+
+
+@dataclass
+class PatternContext:
+    """
+    最近3根K线的OHLC标量，形态判断只看这几根，一次取出后各形态共用
+
+    1 为倒数第三根，3 为最新一根；K线不足3根时缺的字段为NaN，n 为实际根数
+    """
+    n: int
+    o1: float
+    h1: float
+    l1: float
+    c1: float
+    o2: float
+    h2: float
+    l2: float
+    c2: float
+    o3: float
+    h3: float
+    l3: float
+    c3: float
+
+
+# 形态检测接受 DataFrame、prepare() 取好的 Bars 或 make_context() 取好的 PatternContext
+BarsLike = Union[pd.DataFrame, Bars, PatternContext]
+
+
 class PatternRecognizer:
     """K线形态识别器"""
 
@@ -60,18 +125,265 @@ class PatternRecognizer:
     @staticmethod
     def _upper_shadow(open_price: float, close_price: float, high: float) -> float:
         """计算上影线长度"""
-        return high - max(open_price, close_price)
+        # 直接比较，省去内置 max 的参数打包开销（逐根K线调用）
+        return high - (open_price if open_price > close_price else close_price)
 
     @staticmethod
     def _lower_shadow(open_price: float, close_price: float, low: float) -> float:
         """计算下影线长度"""
-        return min(open_price, close_price) - low
+        return (open_price if open_price < close_price else close_price) - low
 
-    def check_bullish_engulfing(
+    @staticmethod
+    def prepare(df: Union[pd.DataFrame, Bars], dtype: type = np.float64) -> Bars:
+        """
+        取出OHLC数组；已是 Bars 时原样返回（dtype 不同时转换）
+
+        dtype 传 np.float32 时数组减半，批量扫描的内存带宽和SIMD吞吐翻倍，
+        价格比较不需要双精度；实盘信号保持默认的 float64
+        """
+        if isinstance(df, Bars):
+            if df.close.dtype == dtype:
+                return df
+            return Bars(*(arr.astype(dtype) for arr in df))
+        # 切片、混合类型的 DataFrame 取出的列可能不连续，统一转成连续数组便于向量化/JIT内核顺序读取
+        return Bars(*(np.ascontiguousarray(df[col].to_numpy(dtype=dtype)) for col in Bars._fields))
+
+    @staticmethod
+    def scan_dark_cloud_cover(bars: Bars) -> np.ndarray:
+        """
+        整段K线一次性计算乌云盖顶强度，用于回测
+
+        Returns:
+            float数组，第i个为第i根K线构成乌云盖顶时的强度，不构成时为0
+        """
+        po, pc = bars.open[:-1], bars.close[:-1]
+        co, cc = bars.open[1:], bars.close[1:]
+        matched = (pc > po) & (cc < co) & (co > pc) & (cc < (po + pc) / 2) & (cc > po)
+
+        # 强度按插入深度线性增加，封顶0.9；不构成的位置置0，全程无分支
+        body = np.where(matched, pc - po, 1.0)
+        strength = np.zeros(bars.n, dtype=bars.close.dtype)
+        strength[1:] = np.where(matched, np.minimum(0.6 + (pc - cc) / body * 0.3, 0.9), 0.0)
+        return strength
+
+    @staticmethod
+    def scan_piercing_line(bars: Bars) -> np.ndarray:
+        """
+        整段K线一次性计算刺透形态强度，用于回测
+
+        Returns:
+            float数组，第i个为第i根K线构成刺透形态时的强度，不构成时为0
+        """
+        po, pc = bars.open[:-1], bars.close[:-1]
+        co, cc = bars.open[1:], bars.close[1:]
+        matched = (pc < po) & (cc > co) & (co < pc) & (cc > (po + pc) / 2) & (cc < po)
+
+        body = np.where(matched, po - pc, 1.0)
+        strength = np.zeros(bars.n, dtype=bars.close.dtype)
+        strength[1:] = np.where(matched, np.minimum(0.6 + (cc - pc) / body * 0.3, 0.9), 0.0)
+        return strength
+
+    @staticmethod
+    def scan_trend(close: np.ndarray, period: int = 10) -> np.ndarray:
+        """
+        整段K线一次性计算每根K线处的 detect_trend 结果
+
+        Returns:
+            字符串数组，取值 "up" / "down" / "sideways"，前 period-1 根为 "sideways"
+        """
+        half = period // 2
+        trend = np.full(len(close), "sideways", dtype=object)
+        if half == 0 or len(close) < period:
+            return trend
+
+        # 第i根处：后半段均值为以i结尾的half均线，前半段均值为以 i-period+half 结尾的half均线
+        half_ma = calculate_ma_np(close, half)
+        second_half = half_ma[period - 1:]
+        first_half = half_ma[half - 1:len(close) - period + half]
+        change_pct = (second_half - first_half) / first_half
+
+        trend[period - 1:][change_pct > 0.03] = "up"
+        trend[period - 1:][change_pct < -0.03] = "down"
+        return trend
+
+    def scan_all(
+        self,
+        df: Union[pd.DataFrame, Bars],
+        trend_period: int = 10,
+        dtype: type = np.float64
+    ) -> pd.DataFrame:
+        """
+        整段K线一次性判断全部形态，用于回测
+
+        各形态共用实体、影线等中间数组，每个形态只是一条向量表达式，
+        不再逐根K线调用九个 check_* 方法。吞没形态不含放量条件（同 scan_bullish_engulfing）。
+        回测可传 dtype=np.float32 减半内存读写（见 prepare）。
+
+        Returns:
+            bool DataFrame，列为 detect_all_patterns 的形态ID，第i行表示第i根K线处是否出现该形态；
+            传入 DataFrame 时与其索引对齐
+        """
+        bars = self.prepare(df, dtype)
+        o, h, l, c = bars
+        n = bars.n
+
+        is_bull = c > o
+        is_bear = c < o
+        body = np.abs(c - o)
+        upper = h - np.maximum(o, c)
+        lower = np.minimum(o, c) - l
+        total_range = h - l
+
+        def shifted(mask: np.ndarray, lag: int) -> np.ndarray:
+            """把只从第 lag 根起才有定义的结果补齐到全长"""
+            out = np.zeros(n, dtype=bool)
+            if n > lag:
+                out[lag:] = mask
+            return out
+
+        bullish_engulfing = shifted(
+            is_bear[:-1] & is_bull[1:] & (o[1:] < c[:-1]) & (c[1:] > o[:-1]), 1
+        )
+        bearish_engulfing = shifted(
+            is_bull[:-1] & is_bear[1:] & (o[1:] > c[:-1]) & (c[1:] < o[:-1]), 1
+        )
+
+        # 锤子线与上吊线形状相同，只是所处趋势不同
+        hammer_shape = (
+            (body >= 0.0001)
+            & (lower >= body * self.hammer_shadow_ratio)
+            & (upper <= body * 0.5)
+        )
+        trend = self.scan_trend(c, trend_period)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            doji = (total_range >= 0.0001) & (body / total_range < self.doji_body_ratio)
+
+        # 三日星形：第一天实体 body1、第二天小实体、第三天反向大实体收过第一天实体中点
+        body1, body2, body3 = body[:-2], body[1:-1], body[2:]
+        mid1 = (o[:-2] + c[:-2]) / 2
+        star_shape = (body2 <= body1 * 0.5) & (body3 >= body1 * 0.5)
+        morning_star = shifted(is_bear[:-2] & star_shape & is_bull[2:] & (c[2:] > mid1), 2)
+        evening_star = shifted(is_bull[:-2] & star_shape & is_bear[2:] & (c[2:] < mid1), 2)
+
+        return pd.DataFrame(
+            {
+                "bullish_engulfing": bullish_engulfing,
+                "bearish_engulfing": bearish_engulfing,
+                "dark_cloud": self.scan_dark_cloud_cover(bars) > 0,
+                "piercing": self.scan_piercing_line(bars) > 0,
+                "hammer": hammer_shape & (trend == "down"),
+                "hanging_man": hammer_shape & (trend == "up"),
+                "doji": doji,
+                "morning_star": morning_star,
+                "evening_star": evening_star,
+            },
+            index=df.index if isinstance(df, pd.DataFrame) else None,
+        )
+
+    @classmethod
+    def make_context(cls, df: BarsLike) -> PatternContext:
+        """取出最近3根K线的OHLC标量；已是 PatternContext 时原样返回"""
+        if isinstance(df, PatternContext):
+            return df
+
+        bars = cls.prepare(df)
+        n = bars.n
+        pad = [float("nan")] * max(0, 3 - n)
+        o, h, l, c = (pad + arr[-3:].tolist() for arr in bars)
+        return PatternContext(
+            n,
+            o[0], h[0], l[0], c[0],
+            o[1], h[1], l[1], c[1],
+            o[2], h[2], l[2], c[2],
+        )
+
+    def detect_all_patterns(
+        self,
+        df: BarsLike,
+        volume_ratio: Optional[float] = None,
+        trend: Union[str, "TrendCache", None] = None
+    ) -> Iterator[Tuple[str, PatternResult]]:
+        """
+        依次检测全部形态，逐个产出 (形态ID, 结果)，未出现的形态结果为 NO_MATCH
+
+        K线只取一次供各形态共用；按需迭代，调用方可以随时停止。
+        trend 为空时由 df 计算，为 TrendCache 时从缓存取；这两种情况 df 需为 DataFrame 或 Bars，
+        传 PatternContext（只有最近3根K线）时 trend 须为字符串，否则抛 TypeError。
+        """
+        if trend is None:
+            trend = self.detect_trend(df)
+        else:
+            trend = self._resolve_trend(df, trend)
+        ctx = self.make_context(df)
+
+        yield "bullish_engulfing", self.check_bullish_engulfing(ctx, volume_ratio)
+        yield "bearish_engulfing", self.check_bearish_engulfing(ctx, volume_ratio)
+        yield "dark_cloud", self.check_dark_cloud_cover(ctx)
+        yield "piercing", self.check_piercing_line(ctx)
+        yield "hammer", self.check_hammer(ctx, trend)
+        yield "hanging_man", self.check_hanging_man(ctx, trend)
+        yield "doji", self.check_doji(ctx)
+        yield "morning_star", self.check_morning_star(ctx)
+        yield "evening_star", self.check_evening_star(ctx)
+
+    @staticmethod
+    def scan_bullish_engulfing(bars: Bars) -> np.ndarray:
+        """
+        整段K线一次性判断阳吞阴（不含放量条件），用于回测
+
+        Returns:
+            bool数组，第i个为True表示第i根K线与前一根构成阳吞阴
+        """
+        o, c = bars.open, bars.close
+        mask = np.zeros(bars.n, dtype=bool)
+        mask[1:] = (c[:-1] < o[:-1]) & (c[1:] > o[1:]) & (o[1:] < c[:-1]) & (c[1:] > o[:-1])
+        return mask
+
+    @staticmethod
+    def scan_bearish_engulfing(bars: Bars) -> np.ndarray:
+        """
+        整段K线一次性判断阴吞阳（不含放量条件），用于回测
+
+        Returns:
+            bool数组，第i个为True表示第i根K线与前一根构成阴吞阳
+        """
+        o, c = bars.open, bars.close
+        mask = np.zeros(bars.n, dtype=bool)
+        mask[1:] = (c[:-1] > o[:-1]) & (c[1:] < o[1:]) & (o[1:] > c[:-1]) & (c[1:] < o[:-1])
+        return mask
+
+    def scan_engulfing_strength(
         self,
         df: pd.DataFrame,
+        volume_period: int = 5,
+        dtype: type = np.float64
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        整段K线一次性计算阳吞阴、阴吞阳强度（含放量条件），用于回测
+
+        量比整段算一次，强度按是否放量用 np.where 选取，逐根K线没有Python分支；
+        量比不足 volume_period 根时按1.0计（同 SignalDetector）
+
+        Returns:
+            (阳吞阴强度, 阴吞阳强度)，不构成形态的位置为0
+        """
+        bars = self.prepare(df, dtype)
+        volume_ratio = calculate_volume_ratio(df["volume"].to_numpy(dtype=np.float64), volume_period)
+        volume_ratio[:volume_period] = 1.0
+        strength = np.where(volume_ratio > self.engulfing_volume_ratio, 0.9, 0.7).astype(dtype)
+
+        zero = np.zeros((), dtype=dtype)
+        return (
+            np.where(self.scan_bullish_engulfing(bars), strength, zero),
+            np.where(self.scan_bearish_engulfing(bars), strength, zero),
+        )
+
+    def check_bullish_engulfing(
+        self,
+        df: BarsLike,
         volume_ratio: Optional[float] = None
-    ) -> Optional[PatternResult]:
+    ) -> PatternResult:
         """
         检测阳吞阴 (看涨吞没形态)
 
@@ -81,42 +393,27 @@ class PatternRecognizer:
         3. 当前阳线实体完全包含前一根阴线实体
         4. 成交量放大 (可选)
         """
-        if len(df) < 2:
-            return None
-
-        prev = df.iloc[-2]
-        curr = df.iloc[-1]
-
-        # 前一根是阴线
-        if not self._is_bearish(prev["open"], prev["close"]):
-            return None
-
-        # 当前是阳线
-        if not self._is_bullish(curr["open"], curr["close"]):
-            return None
+        ctx = self.make_context(df)
+        if ctx.n < 2:
+            return NO_MATCH
 
-        # 阳线开盘低于阴线收盘，阳线收盘高于阴线开盘
-        if curr["open"] < prev["close"] and curr["close"] > prev["open"]:
-            strength = 0.7
+        prev_open, prev_close = ctx.o2, ctx.c2
+        curr_open, curr_close = ctx.o3, ctx.c3
 
-            # 放量增强信号
-            if volume_ratio and volume_ratio > self.engulfing_volume_ratio:
-                strength = 0.9
+        matched, strength = _patterns_jit.bullish_engulfing(
+            prev_open, prev_close, curr_open, curr_close,
+            float(volume_ratio or 0.0), self.engulfing_volume_ratio
+        )
+        if not matched:
+            return NO_MATCH
 
-            return PatternResult(
-                name="阳吞阴",
-                signal_type=SignalType.BULLISH,
-                strength=strength,
-                description="阳线实体完全包含前一根阴线，看涨信号"
-            )
-
-        return None
+        return _BULLISH_ENGULFING_STRONG if strength > 0.7 else _BULLISH_ENGULFING_WEAK
 
     def check_bearish_engulfing(
         self,
-        df: pd.DataFrame,
+        df: BarsLike,
         volume_ratio: Optional[float] = None
-    ) -> Optional[PatternResult]:
+    ) -> PatternResult:
         """
         检测阴吞阳 (看跌吞没形态)
 
@@ -125,37 +422,23 @@ class PatternRecognizer:
         2. 当前是阴线
         3. 当前阴线实体完全包含前一根阳线实体
         """
-        if len(df) < 2:
-            return None
-
-        prev = df.iloc[-2]
-        curr = df.iloc[-1]
-
-        # 前一根是阳线
-        if not self._is_bullish(prev["open"], prev["close"]):
-            return None
-
-        # 当前是阴线
-        if not self._is_bearish(curr["open"], curr["close"]):
-            return None
+        ctx = self.make_context(df)
+        if ctx.n < 2:
+            return NO_MATCH
 
-        # 阴线开盘高于阳线收盘，阴线收盘低于阳线开盘
-        if curr["open"] > prev["close"] and curr["close"] < prev["open"]:
-            strength = 0.7
+        prev_open, prev_close = ctx.o2, ctx.c2
+        curr_open, curr_close = ctx.o3, ctx.c3
 
-            if volume_ratio and volume_ratio > self.engulfing_volume_ratio:
-                strength = 0.9
+        matched, strength = _patterns_jit.bearish_engulfing(
+            prev_open, prev_close, curr_open, curr_close,
+            float(volume_ratio or 0.0), self.engulfing_volume_ratio
+        )
+        if not matched:
+            return NO_MATCH
 
-            return PatternResult(
-                name="阴吞阳",
-                signal_type=SignalType.BEARISH,
-                strength=strength,
-                description="阴线实体完全包含前一根阳线，看跌信号"
-            )
+        return _BEARISH_ENGULFING_STRONG if strength > 0.7 else _BEARISH_ENGULFING_WEAK
 
-        return None
-
-    def check_dark_cloud_cover(self, df: pd.DataFrame) -> Optional[PatternResult]:
+    def check_dark_cloud_cover(self, df: BarsLike) -> PatternResult:
         """
         检测乌云盖顶
 
@@ -164,40 +447,36 @@ class PatternRecognizer:
         2. 当前阴线高开（开盘价高于前阳线最高价）
         3. 收盘价深入前阳线实体50%以下
         """
-        if len(df) < 2:
-            return None
+        ctx = self.make_context(df)
+        if ctx.n < 2:
+            return NO_MATCH
 
-        prev = df.iloc[-2]
-        curr = df.iloc[-1]
+        prev_open, prev_close = ctx.o2, ctx.c2
+        curr_open, curr_close = ctx.o3, ctx.c3
 
         # 前一根是阳线
-        if not self._is_bullish(prev["open"], prev["close"]):
-            return None
+        if not self._is_bullish(prev_open, prev_close):
+            return NO_MATCH
 
         # 当前是阴线
-        if not self._is_bearish(curr["open"], curr["close"]):
-            return None
+        if not self._is_bearish(curr_open, curr_close):
+            return NO_MATCH
 
         # 高开：开盘价高于前阳线收盘价
-        if curr["open"] <= prev["close"]:
-            return None
+        if curr_open <= prev_close:
+            return NO_MATCH
 
         # 收盘价插入前阳线实体50%以下
-        prev_midpoint = (prev["open"] + prev["close"]) / 2
-        if curr["close"] < prev_midpoint and curr["close"] > prev["open"]:
-            penetration = (prev["close"] - curr["close"]) / (prev["close"] - prev["open"])
+        prev_midpoint = (prev_open + prev_close) / 2
+        if curr_close < prev_midpoint and curr_close > prev_open:
+            penetration = (prev_close - curr_close) / (prev_close - prev_open)
             strength = min(0.6 + penetration * 0.3, 0.9)
 
-            return PatternResult(
-                name="乌云盖顶",
-                signal_type=SignalType.BEARISH,
-                strength=strength,
-                description="跳空高开后阴线深入前阳线实体，强烈看跌信号"
-            )
+            return replace(_DARK_CLOUD, strength=strength)
 
-        return None
+        return NO_MATCH
 
-    def check_piercing_line(self, df: pd.DataFrame) -> Optional[PatternResult]:
+    def check_piercing_line(self, df: BarsLike) -> PatternResult:
         """
         检测刺透形态 (穿透形态)
 
@@ -206,40 +485,43 @@ class PatternRecognizer:
         2. 当前阳线低开（开盘价低于前阴线最低价）
         3. 收盘价穿透前阴线实体50%以上
         """
-        if len(df) < 2:
-            return None
+        ctx = self.make_context(df)
+        if ctx.n < 2:
+            return NO_MATCH
 
-        prev = df.iloc[-2]
-        curr = df.iloc[-1]
+        prev_open, prev_close = ctx.o2, ctx.c2
+        curr_open, curr_close = ctx.o3, ctx.c3
 
         # 前一根是阴线
-        if not self._is_bearish(prev["open"], prev["close"]):
-            return None
+        if not self._is_bearish(prev_open, prev_close):
+            return NO_MATCH
 
         # 当前是阳线
-        if not self._is_bullish(curr["open"], curr["close"]):
-            return None
+        if not self._is_bullish(curr_open, curr_close):
+            return NO_MATCH
 
         # 低开：开盘价低于前阴线收盘价
-        if curr["open"] >= prev["close"]:
-            return None
+        if curr_open >= prev_close:
+            return NO_MATCH
 
         # 收盘价穿透前阴线实体50%以上
-        prev_midpoint = (prev["open"] + prev["close"]) / 2
-        if curr["close"] > prev_midpoint and curr["close"] < prev["open"]:
-            penetration = (curr["close"] - prev["close"]) / (prev["open"] - prev["close"])
+        prev_midpoint = (prev_open + prev_close) / 2
+        if curr_close > prev_midpoint and curr_close < prev_open:
+            penetration = (curr_close - prev_close) / (prev_open - prev_close)
             strength = min(0.6 + penetration * 0.3, 0.9)
 
-            return PatternResult(
-                name="刺透形态",
-                signal_type=SignalType.BULLISH,
-                strength=strength,
-                description="跳空低开后阳线穿透前阴线实体，看涨信号"
-            )
+            return replace(_PIERCING, strength=strength)
+
+        return NO_MATCH
 
-        return None
+    @staticmethod
+    def _resolve_trend(df: BarsLike, trend: Union[str, "TrendCache"]) -> str:
+        """trend 为 TrendCache 时按 df 取缓存的趋势（df 需为 DataFrame 或 Bars，PatternContext 抛 TypeError）"""
+        if isinstance(trend, TrendCache):
+            return trend.trend(df)
+        return trend
 
-    def check_hammer(self, df: pd.DataFrame, trend: str = "down") -> Optional[PatternResult]:
+    def check_hammer(self, df: BarsLike, trend: Union[str, "TrendCache"] = "down") -> PatternResult:
         """
         检测锤子线
 
@@ -247,40 +529,39 @@ class PatternRecognizer:
         1. 出现在下跌趋势底部
         2. 下影线长度 >= 实体长度 * 2
         3. 上影线很短或没有
+
+        trend 可传 TrendCache，与上吊线等共用同一次趋势判断
         """
-        if len(df) < 1:
-            return None
+        trend = self._resolve_trend(df, trend)
+        ctx = self.make_context(df)
+        if ctx.n < 1:
+            return NO_MATCH
 
-        curr = df.iloc[-1]
+        curr_open, curr_high, curr_low, curr_close = ctx.o3, ctx.h3, ctx.l3, ctx.c3
 
-        body = self._body_size(curr["open"], curr["close"])
-        lower_shadow = self._lower_shadow(curr["open"], curr["close"], curr["low"])
-        upper_shadow = self._upper_shadow(curr["open"], curr["close"], curr["high"])
+        body = self._body_size(curr_open, curr_close)
+        lower_shadow = self._lower_shadow(curr_open, curr_close, curr_low)
+        upper_shadow = self._upper_shadow(curr_open, curr_close, curr_high)
 
         # 避免除以0
         if body < 0.0001:
-            return None
+            return NO_MATCH
 
         # 下影线 >= 实体 * 2
         if lower_shadow < body * self.hammer_shadow_ratio:
-            return None
+            return NO_MATCH
 
         # 上影线很短
         if upper_shadow > body * 0.5:
-            return None
+            return NO_MATCH
 
         # 在下跌趋势中更有意义
         if trend == "down":
-            return PatternResult(
-                name="锤子线",
-                signal_type=SignalType.BULLISH,
-                strength=0.7,
-                description="底部出现锤子线，可能反转向上"
-            )
+            return _HAMMER
 
-        return None
+        return NO_MATCH
 
-    def check_hanging_man(self, df: pd.DataFrame, trend: str = "up") -> Optional[PatternResult]:
+    def check_hanging_man(self, df: BarsLike, trend: Union[str, "TrendCache"] = "up") -> PatternResult:
         """
         检测上吊线
 
@@ -288,65 +569,60 @@ class PatternRecognizer:
         1. 出现在上涨趋势顶部
         2. 下影线长度 >= 实体长度 * 2
         3. 上影线很短或没有
+
+        trend 可传 TrendCache，与锤子线等共用同一次趋势判断
         """
-        if len(df) < 1:
-            return None
+        trend = self._resolve_trend(df, trend)
+        ctx = self.make_context(df)
+        if ctx.n < 1:
+            return NO_MATCH
 
-        curr = df.iloc[-1]
+        curr_open, curr_high, curr_low, curr_close = ctx.o3, ctx.h3, ctx.l3, ctx.c3
 
-        body = self._body_size(curr["open"], curr["close"])
-        lower_shadow = self._lower_shadow(curr["open"], curr["close"], curr["low"])
-        upper_shadow = self._upper_shadow(curr["open"], curr["close"], curr["high"])
+        body = self._body_size(curr_open, curr_close)
+        lower_shadow = self._lower_shadow(curr_open, curr_close, curr_low)
+        upper_shadow = self._upper_shadow(curr_open, curr_close, curr_high)
 
         if body < 0.0001:
-            return None
+            return NO_MATCH
 
         if lower_shadow < body * self.hammer_shadow_ratio:
-            return None
+            return NO_MATCH
 
         if upper_shadow > body * 0.5:
-            return None
+            return NO_MATCH
 
         if trend == "up":
-            return PatternResult(
-                name="上吊线",
-                signal_type=SignalType.BEARISH,
-                strength=0.7,
-                description="顶部出现上吊线，可能反转向下"
-            )
+            return _HANGING_MAN
 
-        return None
+        return NO_MATCH
 
-    def check_doji(self, df: pd.DataFrame) -> Optional[PatternResult]:
+    def check_doji(self, df: BarsLike) -> PatternResult:
         """
         检测十字星
 
         条件:
         开盘价约等于收盘价（实体非常小）
         """
-        if len(df) < 1:
-            return None
+        ctx = self.make_context(df)
+        if ctx.n < 1:
+            return NO_MATCH
 
-        curr = df.iloc[-1]
+        curr_open, curr_high, curr_low, curr_close = ctx.o3, ctx.h3, ctx.l3, ctx.c3
 
-        body = self._body_size(curr["open"], curr["close"])
-        total_range = curr["high"] - curr["low"]
+        body = self._body_size(curr_open, curr_close)
+        total_range = curr_high - curr_low
 
         if total_range < 0.0001:
-            return None
+            return NO_MATCH
 
         # 实体占振幅比例很小
         if body / total_range < self.doji_body_ratio:
-            return PatternResult(
-                name="十字星",
-                signal_type=SignalType.NEUTRAL,
-                strength=0.5,
-                description="十字星出现，市场犹豫不决，需结合位置判断"
-            )
+            return _DOJI
 
-        return None
+        return NO_MATCH
 
-    def check_morning_star(self, df: pd.DataFrame) -> Optional[PatternResult]:
+    def check_morning_star(self, df: BarsLike) -> PatternResult:
         """
         检测启明星 (早晨之星)
 
@@ -355,44 +631,22 @@ class PatternRecognizer:
         2. 第二天小实体（跳空低开）
         3. 第三天大阳线，收盘价进入第一天阴线实体
         """
-        if len(df) < 3:
-            return None
-
-        day1 = df.iloc[-3]
-        day2 = df.iloc[-2]
-        day3 = df.iloc[-1]
+        ctx = self.make_context(df)
+        if ctx.n < 3:
+            return NO_MATCH
 
-        # 第一天大阴线
-        if not self._is_bearish(day1["open"], day1["close"]):
-            return None
+        day1_open, day2_open, day3_open = ctx.o1, ctx.o2, ctx.o3
+        day1_close, day2_close, day3_close = ctx.c1, ctx.c2, ctx.c3
 
-        body1 = self._body_size(day1["open"], day1["close"])
+        matched, _ = _patterns_jit.morning_star(
+            day1_open, day1_close, day2_open, day2_close, day3_open, day3_close
+        )
+        if not matched:
+            return NO_MATCH
 
-        # 第二天小实体
-        body2 = self._body_size(day2["open"], day2["close"])
-        if body2 > body1 * 0.5:
-            return None
+        return _MORNING_STAR
 
-        # 第三天大阳线
-        if not self._is_bullish(day3["open"], day3["close"]):
-            return None
-
-        body3 = self._body_size(day3["open"], day3["close"])
-        if body3 < body1 * 0.5:
-            return None
-
-        # 第三天收盘价进入第一天实体
-        if day3["close"] > (day1["open"] + day1["close"]) / 2:
-            return PatternResult(
-                name="启明星",
-                signal_type=SignalType.BULLISH,
-                strength=0.85,
-                description="底部启明星形态，强烈看涨信号"
-            )
-
-        return None
-
-    def check_evening_star(self, df: pd.DataFrame) -> Optional[PatternResult]:
+    def check_evening_star(self, df: BarsLike) -> PatternResult:
         """
         检测黄昏星 (暮星)
 
@@ -401,56 +655,49 @@ class PatternRecognizer:
         2. 第二天小实体（跳空高开）
         3. 第三天大阴线，收盘价进入第一天阳线实体
         """
-        if len(df) < 3:
-            return None
-
-        day1 = df.iloc[-3]
-        day2 = df.iloc[-2]
-        day3 = df.iloc[-1]
-
-        # 第一天大阳线
-        if not self._is_bullish(day1["open"], day1["close"]):
-            return None
+        ctx = self.make_context(df)
+        if ctx.n < 3:
+            return NO_MATCH
 
-        body1 = self._body_size(day1["open"], day1["close"])
+        day1_open, day2_open, day3_open = ctx.o1, ctx.o2, ctx.o3
+        day1_close, day2_close, day3_close = ctx.c1, ctx.c2, ctx.c3
 
-        # 第二天小实体
-        body2 = self._body_size(day2["open"], day2["close"])
-        if body2 > body1 * 0.5:
-            return None
+        matched, _ = _patterns_jit.evening_star(
+            day1_open, day1_close, day2_open, day2_close, day3_open, day3_close
+        )
+        if not matched:
+            return NO_MATCH
 
-        # 第三天大阴线
-        if not self._is_bearish(day3["open"], day3["close"]):
-            return None
+        return _EVENING_STAR
 
-        body3 = self._body_size(day3["open"], day3["close"])
-        if body3 < body1 * 0.5:
-            return None
-
-        # 第三天收盘价进入第一天实体
-        if day3["close"] < (day1["open"] + day1["close"]) / 2:
-            return PatternResult(
-                name="黄昏星",
-                signal_type=SignalType.BEARISH,
-                strength=0.85,
-                description="顶部黄昏星形态，强烈看跌信号"
-            )
+    @staticmethod
+    def close_array(df: BarsLike) -> np.ndarray:
+        """
+        取整段收盘价数组（DataFrame 或 Bars）
 
-        return None
+        PatternContext 只有最近3根K线，不能用于趋势、均线等需要整段收盘价的计算
+        """
+        if isinstance(df, PatternContext):
+            raise TypeError("趋势/均线计算需要整段K线（DataFrame 或 Bars），PatternContext 只含最近3根")
+        if isinstance(df, Bars):
+            return df.close
+        return df["close"].to_numpy(dtype=np.float64)
 
-    def detect_trend(self, df: pd.DataFrame, period: int = 10) -> str:
+    def detect_trend(self, df: Union[pd.DataFrame, Bars], period: int = 10) -> str:
         """
-        简单趋势判断
+        简单趋势判断（接受 DataFrame 或 Bars；传 PatternContext 抛 TypeError）
 
         Returns:
             "up", "down", or "sideways"
         """
-        if len(df) < period:
+        close = self.close_array(df)
+        if len(close) < period:
             return "sideways"
 
-        closes = df["close"].tail(period)
-        first_half = closes.head(period // 2).mean()
-        second_half = closes.tail(period // 2).mean()
+        closes = close[-period:]
+        half = period // 2
+        first_half = closes[:half].mean()
+        second_half = closes[-half:].mean()
 
         change_pct = (second_half - first_half) / first_half
 
@@ -460,3 +707,55 @@ class PatternRecognizer:
             return "down"
         else:
             return "sideways"
+
+
+class TrendCache:
+    """
+    同一段K线的趋势判断与均线缓存，回测中同一根K线上多个形态（锤子线、上吊线等）共用
+
+    保留当前K线段（DataFrame 或 Bars）的引用，按 (同一对象, 行数, 最新收盘价) 判断是否还是同一段K线：
+    追加新K线或换了K线段时自动清空重算。持有引用也避免了对象回收后 id 被复用的误命中。
+    check_hammer / check_hanging_man / detect_all_patterns 的 trend 参数可直接传入本对象。
+
+    用法:
+        cache = TrendCache(recognizer)
+        recognizer.check_hammer(window, trend=cache)
+        recognizer.check_hanging_man(window, trend=cache)  # 命中缓存
+    """
+
+    def __init__(self, recognizer: PatternRecognizer):
+        self.recognizer = recognizer
+        self._df: Optional[Union[pd.DataFrame, Bars]] = None
+        self._n = 0
+        self._last_close = None
+        self._trends: Dict[int, str] = {}
+        self._mas: Dict[int, np.ndarray] = {}
+
+    def _sync(self, df: Union[pd.DataFrame, Bars]) -> np.ndarray:
+        """换了K线段时清空缓存，返回收盘价数组"""
+        close = self.recognizer.close_array(df)
+        n = len(close)
+        last_close = close[-1] if n else None
+        if df is not self._df or n != self._n or last_close != self._last_close:
+            self._df = df
+            self._n = n
+            self._last_close = last_close
+            self._trends.clear()
+            self._mas.clear()
+        return close
+
+    def trend(self, df: Union[pd.DataFrame, Bars], period: int = 10) -> str:
+        """返回 recognizer.detect_trend(df, period)，同一段K线只算一次"""
+        self._sync(df)
+        trend = self._trends.get(period)
+        if trend is None:
+            trend = self._trends[period] = self.recognizer.detect_trend(df, period)
+        return trend
+
+    def ma(self, df: Union[pd.DataFrame, Bars], period: int) -> np.ndarray:
+        """收盘价的 period 日均线（同 calculate_ma_np），同一段K线只算一次；返回的数组共用，不要原地修改"""
+        close = self._sync(df)
+        ma = self._mas.get(period)
+        if ma is None:
+            ma = self._mas[period] = calculate_ma_np(close, period)
+        return ma
@@ -0,0 +1,201 @@
+"""
+市场扫描 - Top10推荐的核心逻辑（不依赖界面，可在后台任务中运行）
+"""
+import heapq
+import itertools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .analyzer import StrategyAnalysis, StrategyAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# 分析失败的股票在此时间内（秒）跳过，避免每次扫描都重试同一批问题股票
+FAIL_SKIP_SECONDS = 300
+
+# 代码 -> 最近一次失败的时间
+_fail_cache: Dict[str, float] = {}
+
+
+def _mark_failed(code: str, name: str, reason) -> None:
+    """记录失败时间，冷却期内的扫描跳过该股票"""
+    _fail_cache[code] = time.monotonic()
+    logger.warning("分析 %s %s 失败，%d秒内跳过: %r", code, name, FAIL_SKIP_SECONDS, reason)
+
+
+def _recently_failed(code: str) -> bool:
+    """是否在冷却期内失败过"""
+    failed_at = _fail_cache.get(code)
+    return failed_at is not None and time.monotonic() - failed_at < FAIL_SKIP_SECONDS
+
+
+# 子进程内复用的分析器（每个进程一个）
+_worker_analyzer: Optional[StrategyAnalyzer] = None
+
+
+def _process_context():
+    """进程池的启动方式：优先 forkserver，不可用时 spawn，避免在多线程进程中 fork"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _analyze_in_process(code: str, name: str, df) -> Optional[StrategyAnalysis]:
+    """在子进程中分析一只股票（需为模块级函数才能被pickle）"""
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = StrategyAnalyzer()
+    return _worker_analyzer.analyze(df, code, name)
+
+
+def score_analysis(analysis: StrategyAnalysis) -> Tuple[int, int, int]:
+    """
+    计算综合评分（强信号3分，中信号1分）
+
+    Returns:
+        (综合得分, 多方得分, 空方得分)
+    """
+    # 多空得分在分析时已算好
+    return analysis.bullish_score - analysis.bearish_score, analysis.bullish_score, analysis.bearish_score
+
+
+def prefilter_by_quotes(fetcher, stocks: List[Dict], keep: int = 30) -> List[Dict]:
+    """
+    用批量实时行情给候选股打粗分，保留得分最高的keep只
+
+    粗分规则: 量比>1、涨跌幅在[-3%, 5%]之间、收阳线 各得1分，同分按量比排序
+    """
+    quotes = fetcher.get_batch_quotes([s["code"] for s in stocks])
+    if not quotes:
+        return stocks[:keep]
+
+    def pre_score(stock):
+        q = quotes.get(stock["code"])
+        if not q:
+            return (0, 0)
+        score = (q["volume_ratio"] > 1) + (-3 <= q["pct_change"] <= 5) + (q["price"] > q["open"])
+        return (score, q["volume_ratio"])
+
+    return sorted(stocks, key=pre_score, reverse=True)[:keep]
+
+
+def analyze_candidate(
+    stock: Dict,
+    analyze_fn: Callable[[str, str], Optional[StrategyAnalysis]]
+) -> Optional[Dict]:
+    """分析单只候选股，返回结果字典；数据不足、偏空或失败时返回None"""
+    code = stock["code"]
+    name = stock["name"]
+
+    try:
+        analysis = analyze_fn(code, name)
+        if not analysis:
+            # DataFetcher 内部吞掉网络异常只返回None，拿不到数据（或数据不足）同样按失败处理，
+            # 否则网络不稳定的股票每次扫描都会重新请求
+            _mark_failed(code, name, "无K线数据或数据不足")
+            return None
+
+        score, bullish_score, bearish_score = score_analysis(analysis)
+
+        # 只保留正分的股票（偏多）
+        if score <= 0:
+            return None
+
+        return {
+            "code": code,
+            "name": name,
+            "score": score,
+            "bullish_score": bullish_score,
+            "bearish_score": bearish_score,
+            "analysis": analysis,
+            "change_pct": stock.get("change_pct", 0)
+        }
+    except (requests.RequestException, KeyError, ValueError) as e:
+        _mark_failed(code, name, e)
+        return None
+    except Exception:
+        # 非预期错误（多为分析逻辑问题）不拉黑，但记录堆栈，不影响其他股票
+        logger.exception("分析 %s %s 出错", code, name)
+        return None
+
+
+def scan_market(
+    fetcher,
+    analyze_fn: Optional[Callable[[str, str], Optional[StrategyAnalysis]]] = None,
+    limit: int = 150,
+    keep: int = 30,
+    top_n: int = 10,
+    max_workers: int = 16,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    progress_step: int = 10,
+    processes: int = 0
+) -> List[Dict]:
+    """
+    扫描市场，返回评分最高的top_n只股票
+
+    Args:
+        fetcher: DataFetcher
+        analyze_fn: (code, name) -> StrategyAnalysis，默认直接拉取K线分析
+        limit: 按成交额获取的活跃股票数
+        keep: 行情粗筛后保留的候选数
+        top_n: 返回数量
+        max_workers: 并发线程数
+        on_progress: 进度回调 (已完成数, 总数)，在调用线程中执行
+        progress_step: 每完成多少只回调一次进度（最后一只总会回调）
+        processes: 大于0时K线分析放到该数量的子进程中并行（绕开GIL），
+            线程只负责拉取数据；仅在未传入analyze_fn时生效
+    """
+    use_processes = processes > 0 and analyze_fn is None
+
+    if analyze_fn is None:
+        analyzer = StrategyAnalyzer()
+
+        def analyze_fn(code, name):
+            df = fetcher.get_stock_data(code, days=StrategyAnalyzer.LOOKBACK_DAYS)
+            if df is None or len(df) < 30:
+                return None
+            if use_processes:
+                # 线程在此等待子进程结果，不占用GIL
+                return cpu_pool.submit(_analyze_in_process, code, name, df).result()
+            return analyzer.analyze(df, code, name)
+
+    stocks = fetcher.get_stocks_for_scan(limit=limit)
+    if not stocks:
+        return []
+
+    # 跳过最近失败过的股票
+    stocks = [s for s in stocks if not _recently_failed(s["code"])]
+
+    # 批量行情粗筛，只对前keep只拉取K线做完整分析
+    stocks = prefilter_by_quotes(fetcher, stocks, keep=keep)
+
+    # 小顶堆只保留当前得分最高的top_n只，counter保证同分时不比较dict
+    heap = []
+    counter = itertools.count()
+
+    # 主要耗时在网络请求，用线程池并发获取和分析；启用进程池时分析在子进程中进行
+    # 子进程由拉取线程按需启动，此时进程已是多线程：fork 可能继承其他线程持有的锁而死锁，
+    # 改用 forkserver（不支持的平台用 spawn）从干净的进程启动子进程
+    with ProcessPoolExecutor(max_workers=processes, mp_context=_process_context()) \
+            if use_processes else nullcontext() as cpu_pool, \
+            ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = [ex.submit(analyze_candidate, stock, analyze_fn) for stock in stocks]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if result:
+                entry = (result["score"], next(counter), result)
+                if len(heap) < top_n:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heappushpop(heap, entry)
+            # 进度批量上报，减少界面刷新次数
+            if on_progress and (done % progress_step == 0 or done == len(stocks)):
+                on_progress(done, len(stocks))
+
+    # 按评分从高到低
+    return [item for _, _, item in sorted(heap, reverse=True)]
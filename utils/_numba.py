@@ -0,0 +1,14 @@
+"""
+numba 可选依赖封装 - 未安装时 njit 退化为原样返回函数，代码按纯Python执行
+"""
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
@@ -1,13 +1,103 @@
 """
 技术指标计算模块
 """
+import math
 import pandas as pd
 import numpy as np
-from typing import Tuple
+from collections import deque
+from typing import List, Sequence, Tuple, Union
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ._numba import njit, prange
+
+try:
+    # 可选依赖：Cython实现的滑动窗口均值/标准差，比 pandas rolling 少了 Block/Index 开销
+    import bottleneck as bn
+except ImportError:
+    bn = None
+
+# 指标函数既接受 pd.Series 也接受 np.ndarray：传入 ndarray 时走纯NumPy路径并返回 ndarray，
+# 省去热路径上每次构造 Series 的开销
+SeriesOrArray = Union[pd.Series, np.ndarray]
+
+
+@njit(cache=True)
+def _macd_core_inplace(close: np.ndarray, alpha_fast: float, alpha_slow: float, alpha_signal: float,
+                       dif: np.ndarray, dea: np.ndarray, hist: np.ndarray) -> None:
+    """
+    一次遍历同时递推快慢EMA、DIF、DEA和柱状图，写入传入的输出数组（安装了numba时JIT编译）
+
+    与 ewm(adjust=False) 逐条一致；输入不能含NaN
+    """
+    n = len(close)
+    if n == 0:
+        return
+
+    ema_fast = ema_slow = close[0]
+    signal = 0.0
+    for i in range(n):
+        x = close[i]
+        ema_fast = alpha_fast * x + (1 - alpha_fast) * ema_fast
+        ema_slow = alpha_slow * x + (1 - alpha_slow) * ema_slow
+        d = ema_fast - ema_slow
+        signal = d if i == 0 else alpha_signal * d + (1 - alpha_signal) * signal
+        dif[i] = d
+        dea[i] = signal
+        hist[i] = (d - signal) * 2
+
+
+@njit(cache=True)
+def _macd_core(close: np.ndarray, alpha_fast: float, alpha_slow: float,
+               alpha_signal: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """单只股票的MACD，见 _macd_core_inplace"""
+    n = len(close)
+    dif = np.empty(n)
+    dea = np.empty(n)
+    hist = np.empty(n)
+    _macd_core_inplace(close, alpha_fast, alpha_slow, alpha_signal, dif, dea, hist)
+    return dif, dea, hist
+
+
+@njit(cache=True, parallel=True)
+def _macd_batch(closes: np.ndarray, alpha_fast: float, alpha_slow: float,
+                alpha_signal: float) -> np.ndarray:
+    """
+    多只股票的MACD，closes 为 (股票数, K线数) 的二维数组，各行之间相互独立，按股票并行计算
+
+    Returns:
+        (3, 股票数, K线数) 数组，依次为 dif、dea、柱状图
+    """
+    n_symbols, n_bars = closes.shape
+    out = np.empty((3, n_symbols, n_bars))
+    for i in prange(n_symbols):
+        _macd_core_inplace(closes[i], alpha_fast, alpha_slow, alpha_signal, out[0, i], out[1, i], out[2, i])
+    return out
+
+
+# 导入时先编译一次，避免首个请求承担JIT延迟
+_macd_core(np.zeros(2), 0.5, 0.5, 0.5)
+_macd_batch(np.zeros((1, 2)), 0.5, 0.5, 0.5)
+
+
+def calculate_ma_np(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    移动平均（纯NumPy，供回测等批量场景直接使用）
+
+    sliding_window_view 生成零拷贝的二维窗口视图，一次向量化求均值；
+    前 period-1 个位置为NaN（同 rolling(period).mean()）；安装了 bottleneck 时用 move_mean
+    """
+    # bottleneck 要求窗口不超过数组长度，数据不足时走下面的全NaN分支
+    if bn is not None and len(values) >= period:
+        return bn.move_mean(values.astype(np.float64, copy=False), period, min_count=period)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period - 1:] = sliding_window_view(values, period).mean(axis=1)
+    return out
 
 
 def calculate_macd(
-    close: pd.Series,
+    close: SeriesOrArray,
     fast_period: int = 12,
     slow_period: int = 26,
     signal_period: int = 9
@@ -27,6 +117,21 @@ def calculate_macd(
         - dea: 信号线
         - macd_hist: MACD柱状图 (dif - dea) * 2
     """
+    alphas = (2 / (fast_period + 1), 2 / (slow_period + 1), 2 / (signal_period + 1))
+
+    if isinstance(close, np.ndarray):
+        return _macd_core(close.astype(np.float64, copy=False), *alphas)
+
+    values = close.to_numpy(dtype=np.float64)
+    if not np.isnan(values).any():
+        dif, dea, macd_hist = _macd_core(values, *alphas)
+        return (
+            pd.Series(dif, index=close.index, name=close.name),
+            pd.Series(dea, index=close.index, name=close.name),
+            pd.Series(macd_hist, index=close.index, name=close.name),
+        )
+
+    # 含缺失值时按 pandas ewm 的规则处理
     # 计算EMA
     ema_fast = close.ewm(span=fast_period, adjust=False).mean()
     ema_slow = close.ewm(span=slow_period, adjust=False).mean()
@@ -43,7 +148,52 @@ def calculate_macd(
     return dif, dea, macd_hist
 
 
-def calculate_ma(series: pd.Series, period: int) -> pd.Series:
+def calculate_macd_batch(
+    closes: Union[np.ndarray, Sequence[pd.Series]],
+    fast_period: int = 12,
+    slow_period: int = 26,
+    signal_period: int = 9
+) -> Union[Tuple[np.ndarray, np.ndarray, np.ndarray], List[Tuple[pd.Series, pd.Series, pd.Series]]]:
+    """
+    批量计算多只股票的MACD（全市场扫描用），安装了numba时按股票多核并行
+
+    Args:
+        closes: (股票数, K线数) 的二维收盘价数组，或多只股票的收盘价序列列表
+        fast_period: 快线周期
+        slow_period: 慢线周期
+        signal_period: 信号线周期
+
+    Returns:
+        传入二维数组时返回 (dif, dea, macd_hist) 三个同形状的二维数组；
+        传入序列列表时按顺序返回每只股票的 (dif, dea, macd_hist)，同 calculate_macd
+    """
+    alphas = (2 / (fast_period + 1), 2 / (slow_period + 1), 2 / (signal_period + 1))
+
+    if isinstance(closes, np.ndarray):
+        dif, dea, macd_hist = _macd_batch(np.ascontiguousarray(closes, dtype=np.float64), *alphas)
+        return dif, dea, macd_hist
+
+    closes = list(closes)
+    if not closes:
+        return []
+
+    # 长度不一或含缺失值时无法拼成一个二维数组，逐只计算
+    matrix = None
+    if len({len(close) for close in closes}) == 1:
+        matrix = np.vstack([close.to_numpy(dtype=np.float64) for close in closes])
+        if np.isnan(matrix).any():
+            matrix = None
+    if matrix is None:
+        return [calculate_macd(close, fast_period, slow_period, signal_period) for close in closes]
+
+    out = _macd_batch(matrix, *alphas)
+    return [
+        tuple(pd.Series(line[i], index=close.index, name=close.name) for line in out)
+        for i, close in enumerate(closes)
+    ]
+
+
+def calculate_ma(series: SeriesOrArray, period: int) -> SeriesOrArray:
     """
     计算移动平均线
 
@@ -54,7 +204,31 @@ def calculate_ma(series: pd.Series, period: int) -> pd.Series:
     Returns:
         移动平均序列
     """
-    return series.rolling(window=period).mean()
+    if isinstance(series, np.ndarray):
+        return calculate_ma_np(series, period)
+    return _rolling_mean(series, period)
+
+
+def _rolling_mean(series: pd.Series, period: int) -> pd.Series:
+    """rolling(period).mean()，安装了 bottleneck 时改用 move_mean"""
+    if bn is None or len(series) < period:
+        return series.rolling(window=period).mean()
+    return pd.Series(
+        bn.move_mean(series.to_numpy(dtype=np.float64), period, min_count=period),
+        index=series.index,
+        name=series.name
+    )
+
+
+def _rolling_std(series: pd.Series, period: int) -> pd.Series:
+    """rolling(period).std()（样本标准差），安装了 bottleneck 时改用 move_std"""
+    if bn is None or len(series) < period:
+        return series.rolling(window=period).std()
+    return pd.Series(
+        bn.move_std(series.to_numpy(dtype=np.float64), period, min_count=period, ddof=1),
+        index=series.index,
+        name=series.name
+    )
 
 
 def calculate_ema(series: pd.Series, period: int) -> pd.Series:
@@ -71,7 +245,7 @@ def calculate_ema(series: pd.Series, period: int) -> pd.Series:
     return series.ewm(span=period, adjust=False).mean()
 
 
-def calculate_volume_ratio(volume: pd.Series, period: int = 5) -> pd.Series:
+def calculate_volume_ratio(volume: SeriesOrArray, period: int = 5) -> SeriesOrArray:
     """
     计算量比 (当前成交量 / 过去N日平均成交量)
 
@@ -82,40 +256,135 @@ def calculate_volume_ratio(volume: pd.Series, period: int = 5) -> pd.Series:
     Returns:
         量比序列
     """
-    ma_volume = volume.rolling(window=period).mean().shift(1)
+    if isinstance(volume, np.ndarray):
+        ratio = np.full(len(volume), np.nan)
+        if len(volume) > period:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio[period:] = volume[period:] / calculate_ma_np(volume, period)[period - 1:-1]
+        return ratio
+
+    ma_volume = _rolling_mean(volume, period).shift(1)
     ratio = volume / ma_volume
     return ratio
 
 
-def calculate_rsi(close: pd.Series, period: int = 14) -> pd.Series:
+@njit(cache=True)
+def _rsi_wilder(close: np.ndarray, period: int) -> np.ndarray:
+    """
+    Wilder平滑RSI：前period个涨跌取简单平均作为起点，
+    之后 avg = ((period-1)*avg + 当日值) / period，一次遍历完成
+    """
+    n = len(close)
+    out = np.full(n, np.nan)
+    if n <= period:
+        return out
+
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, n):
+        d = close[i] - close[i - 1]
+        gain = max(d, 0.0)
+        loss = max(-d, 0.0)
+        if i <= period:
+            avg_gain += gain / period
+            avg_loss += loss / period
+            if i < period:
+                continue
+        else:
+            avg_gain = ((period - 1) * avg_gain + gain) / period
+            avg_loss = ((period - 1) * avg_loss + loss) / period
+
+        if avg_loss > 0:
+            out[i] = 100 - 100 / (1 + avg_gain / avg_loss)
+        elif avg_gain > 0:
+            out[i] = 100.0
+    return out
+
+
+# 导入时先编译一次，避免首个请求承担JIT延迟
+_rsi_wilder(np.zeros(3), 1)
+
+
+def calculate_rsi(close: SeriesOrArray, period: int = 14) -> SeriesOrArray:
     """
-    计算RSI指标
+    计算RSI指标（Wilder平滑）
 
     Args:
         close: 收盘价序列
         period: 周期
 
     Returns:
-        RSI序列
+        RSI序列，前period个位置为NaN；区间内无涨跌时为NaN
+    """
+    if isinstance(close, np.ndarray):
+        return _rsi_wilder(close.astype(np.float64, copy=False), period)
+    return pd.Series(
+        _rsi_wilder(close.to_numpy(dtype=np.float64), period),
+        index=close.index,
+        name=close.name
+    )
+
+
+@njit(cache=True)
+def _bbands(close: np.ndarray, period: int, k: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    delta = close.diff()
-    gain = delta.where(delta > 0, 0)
-    loss = (-delta).where(delta < 0, 0)
+    一次遍历计算布林带：滑动维护窗口和与平方和，标准差为样本标准差（ddof=1，同 rolling().std()）
 
-    avg_gain = gain.rolling(window=period).mean()
-    avg_loss = loss.rolling(window=period).mean()
+    数值都先减去窗口起点附近的价格再累加，降低平方和相减时的精度损失；
+    每过一个窗口长度换一次基准并重新求和，避免加减误差累积
+    """
+    n = len(close)
+    # 输出与输入同精度；窗口和、平方和始终按 float64 累加
+    upper = np.empty_like(close)
+    middle = np.empty_like(close)
+    lower = np.empty_like(close)
+    upper[:] = np.nan
+    middle[:] = np.nan
+    lower[:] = np.nan
+    if n < period or period < 1:
+        return upper, middle, lower
+
+    base = close[0]
+    s = 0.0
+    ss = 0.0
+    for i in range(n):
+        if i >= period and i % period == 0:
+            base = close[i - period + 1]
+            s = 0.0
+            ss = 0.0
+            for j in range(i - period + 1, i + 1):
+                y = close[j] - base
+                s += y
+                ss += y * y
+        else:
+            x = close[i] - base
+            s += x
+            ss += x * x
+            if i >= period:
+                old = close[i - period] - base
+                s -= old
+                ss -= old * old
+
+        if i >= period - 1:
+            mean = s / period
+            var = max(ss - s * mean, 0.0) / (period - 1) if period > 1 else np.nan
+            band = k * np.sqrt(var)
+            middle[i] = mean + base
+            upper[i] = middle[i] + band
+            lower[i] = middle[i] - band
+    return upper, middle, lower
 
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
 
-    return rsi
+# 导入时先编译一次，避免首个请求承担JIT延迟
+_bbands(np.zeros(3), 2, 2.0)
 
 
 def calculate_bollinger_bands(
-    close: pd.Series,
+    close: SeriesOrArray,
     period: int = 20,
-    std_dev: float = 2.0
-) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    std_dev: float = 2.0,
+    dtype: type = np.float64
+) -> Tuple[SeriesOrArray, SeriesOrArray, SeriesOrArray]:
     """
     计算布林带
 
@@ -123,12 +392,25 @@ def calculate_bollinger_bands(
         close: 收盘价序列
         period: 周期
         std_dev: 标准差倍数
+        dtype: 输出精度；批量扫描对精度不敏感时可传 np.float32 减半内存读写，
+            窗口求和仍按 float64 累加。含缺失值的 Series 走 pandas，结果为 float64
 
     Returns:
         (upper, middle, lower) 上轨、中轨、下轨
     """
-    middle = close.rolling(window=period).mean()
-    std = close.rolling(window=period).std()
+    if isinstance(close, np.ndarray):
+        return _bbands(close.astype(dtype, copy=False), period, std_dev)
+
+    values = close.to_numpy(dtype=dtype)
+    if not np.isnan(values).any():
+        return tuple(
+            pd.Series(band, index=close.index, name=close.name)
+            for band in _bbands(values, period, std_dev)
+        )
+
+    # 含缺失值时按 pandas rolling 的规则处理
+    middle = _rolling_mean(close, period)
+    std = _rolling_std(close, period)
 
     upper = middle + std_dev * std
     lower = middle - std_dev * std
@@ -136,7 +418,7 @@ def calculate_bollinger_bands(
     return upper, middle, lower
 
 
-def check_macd_cross(dif: pd.Series, dea: pd.Series) -> Tuple[bool, bool]:
+def check_macd_cross(dif: SeriesOrArray, dea: SeriesOrArray) -> Tuple[bool, bool]:
     """
     检查MACD金叉/死叉
 
@@ -152,22 +434,27 @@ def check_macd_cross(dif: pd.Series, dea: pd.Series) -> Tuple[bool, bool]:
     if len(dif) < 2 or len(dea) < 2:
         return False, False
 
+    (prev_dif, cur_dif), (prev_dea, cur_dea) = np.asarray(dif)[-2:], np.asarray(dea)[-2:]
+
     # 今日DIF在DEA上方，昨日DIF在DEA下方 => 金叉
-    is_golden_cross = (dif.iloc[-1] > dea.iloc[-1]) and (dif.iloc[-2] <= dea.iloc[-2])
+    is_golden_cross = (cur_dif > cur_dea) and (prev_dif <= prev_dea)
 
     # 今日DIF在DEA下方，昨日DIF在DEA上方 => 死叉
-    is_death_cross = (dif.iloc[-1] < dea.iloc[-1]) and (dif.iloc[-2] >= dea.iloc[-2])
+    is_death_cross = (cur_dif < cur_dea) and (prev_dif >= prev_dea)
 
     return is_golden_cross, is_death_cross
 
 
 def check_price_position(
-    close: pd.Series,
+    close: SeriesOrArray,
     ma_periods: list = [5, 10, 20, 60]
 ) -> dict:
     """
     检查价格相对于均线的位置
 
+    只用到各均线的最新值，直接对末尾 period 个收盘价求均值，不计算整条均线；
+    需要完整均线序列时用 calculate_ma / calculate_ma_np
+
     Args:
         close: 收盘价序列
         ma_periods: 均线周期列表
@@ -176,11 +463,12 @@ def check_price_position(
         dict with ma values and position info
     """
     result = {}
-    current_price = close.iloc[-1]
+    values = np.asarray(close, dtype=np.float64)
+    current_price = values[-1]
 
     for period in ma_periods:
-        if len(close) >= period:
-            ma = calculate_ma(close, period).iloc[-1]
+        if len(values) >= period:
+            ma = values[-period:].mean()
             result[f"ma{period}"] = ma
             result[f"above_ma{period}"] = current_price > ma
         else:
@@ -188,3 +476,153 @@ def check_price_position(
             result[f"above_ma{period}"] = None
 
     return result
+
+
+# ============ 流式指标 ============
+# 实盘每来一根新K线只需更新一次状态（O(1)），不必重算整段序列。
+# 每根K线调用一次 update()，结果与对应的批量函数在同一位置的值一致；数据不足时返回NaN。
+
+
+class _RollingWindow:
+    """定长滑动窗口，维护窗口内的和与平方和"""
+
+    __slots__ = ("period", "values", "total", "total_sq", "_updates")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._updates = 0
+
+    def push(self, x: float) -> None:
+        if len(self.values) == self.period:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+
+        # 加减累积的浮点误差每过一个窗口长度重新求和清零
+        self._updates += 1
+        if self._updates % self.period == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.period
+
+
+class StreamingEMA:
+    """流式EMA，对应 calculate_ema"""
+
+    __slots__ = ("alpha", "value", "ready")
+
+    def __init__(self, period: int):
+        self.alpha = 2 / (period + 1)
+        self.value = math.nan
+        self.ready = False
+
+    def update(self, x: float) -> float:
+        self.value = self.alpha * x + (1 - self.alpha) * self.value if self.ready else x
+        self.ready = True
+        return self.value
+
+
+class StreamingSMA:
+    """流式简单移动平均，对应 calculate_ma"""
+
+    __slots__ = ("window", "value")
+
+    def __init__(self, period: int):
+        self.window = _RollingWindow(period)
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        self.window.push(x)
+        if self.window.full:
+            self.value = self.window.total / self.window.period
+        return self.value
+
+
+class StreamingMACD:
+    """流式MACD，对应 calculate_macd，update 返回 (dif, dea, macd_hist)"""
+
+    __slots__ = ("fast", "slow", "signal", "value")
+
+    def __init__(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9):
+        self.fast = StreamingEMA(fast_period)
+        self.slow = StreamingEMA(slow_period)
+        self.signal = StreamingEMA(signal_period)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, x: float) -> Tuple[float, float, float]:
+        dif = self.fast.update(x) - self.slow.update(x)
+        dea = self.signal.update(dif)
+        self.value = (dif, dea, (dif - dea) * 2)
+        return self.value
+
+
+class StreamingRSI:
+    """流式RSI，对应 calculate_rsi（Wilder平滑）"""
+
+    __slots__ = ("period", "avg_gain", "avg_loss", "count", "prev_close", "value")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.count = 0  # 已计入的涨跌个数
+        self.prev_close = None
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        prev, self.prev_close = self.prev_close, x
+        if prev is None:
+            return self.value
+
+        d = x - prev
+        gain = max(d, 0.0)
+        loss = max(-d, 0.0)
+        p = self.period
+        self.count += 1
+        if self.count <= p:
+            # 前period个涨跌取简单平均作为起点
+            self.avg_gain += gain / p
+            self.avg_loss += loss / p
+            if self.count < p:
+                return self.value
+        else:
+            self.avg_gain = ((p - 1) * self.avg_gain + gain) / p
+            self.avg_loss = ((p - 1) * self.avg_loss + loss) / p
+
+        if self.avg_loss > 0:
+            self.value = 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+        else:
+            self.value = 100.0 if self.avg_gain > 0 else math.nan
+        return self.value
+
+
+class StreamingBB:
+    """流式布林带，对应 calculate_bollinger_bands，update 返回 (upper, middle, lower)"""
+
+    __slots__ = ("window", "std_dev", "value")
+
+    def __init__(self, period: int = 20, std_dev: float = 2.0):
+        self.window = _RollingWindow(period)
+        self.std_dev = std_dev
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, x: float) -> Tuple[float, float, float]:
+        w = self.window
+        w.push(x)
+        if w.full:
+            n = w.period
+            middle = w.total / n
+            # 样本标准差（ddof=1，同 rolling().std()）
+            var = max(w.total_sq - w.total * middle, 0.0) / (n - 1) if n > 1 else math.nan
+            band = self.std_dev * math.sqrt(var)
+            self.value = (middle + band, middle, middle - band)
+        return self.value
@@ -0,0 +1,36 @@
+"""
+全局共享实例 - 用 st.cache_resource 缓存，所有页面、所有重跑共用同一份
+
+页面每次交互都会重跑脚本，直接在模块顶层实例化会反复建表检查、初始化；
+分析器本身不保存状态（MACD每次按传入的K线重算），共享只是省去重复创建。
+"""
+import streamlit as st
+
+from data.fetcher import DataFetcher
+from database.models import Database
+from notify.wechat import WeChatNotifier
+from signals.analyzer import StrategyAnalyzer
+
+
+@st.cache_resource
+def get_db() -> Database:
+    """数据库"""
+    return Database()
+
+
+@st.cache_resource
+def get_fetcher() -> DataFetcher:
+    """数据获取器"""
+    return DataFetcher()
+
+
+@st.cache_resource
+def get_analyzer() -> StrategyAnalyzer:
+    """策略分析器"""
+    return StrategyAnalyzer()
+
+
+@st.cache_resource
+def get_notifier() -> WeChatNotifier:
+    """微信推送"""
+    return WeChatNotifier()